@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: categorização compilada (utils.categorias) x loop antigo de substrings.
+
+    python -m benchmarks.bench_categorias
+
+Roda com os mapas reais e com os mapas inflados (palavras-chave sintéticas)
+pra mostrar que o motor novo não cresce com o número de palavras-chave.
+"""
+import random
+import string
+import timeit
+
+from utils import categorias
+from utils.categorias import MAPA_GASTOS, _compilar, _detectar
+
+DESCRICOES = [
+    "uber pro trabalho",
+    "almoço no restaurante do centro",
+    "supermercado carrefour da semana",
+    "netflix",
+    "presente de aniversario da maria",
+    "gasolina posto 1990",
+    "farmácia remédio pra gripe",
+    "curso de inglês online com certificado",
+]
+
+
+def _loop_antigo(mapa: dict, descricao: str) -> str:
+    # cópia do _detectar_categoria original (handlers/rapido.py)
+    d = (descricao or "").strip().lower()
+    for cat, palavras in mapa.items():
+        for p in palavras:
+            if p in d:
+                return cat
+    return "Outros"
+
+
+def _mapa_inflado(extra_por_categoria: int) -> dict:
+    rnd = random.Random(42)
+    mapa = {}
+    for cat, palavras in MAPA_GASTOS.items():
+        sinteticas = ["".join(rnd.choices(string.ascii_lowercase, k=8)) for _ in range(extra_por_categoria)]
+        mapa[cat] = list(palavras) + sinteticas
+    return mapa
+
+
+def _medir(nome: str, fn, repeticoes: int = 2000) -> float:
+    total = timeit.timeit(lambda: [fn(d) for d in DESCRICOES], number=repeticoes)
+    por_chamada_us = total / (repeticoes * len(DESCRICOES)) * 1e6
+    print(f"  {nome:<12} {por_chamada_us:8.2f} µs/descrição")
+    return por_chamada_us
+
+
+def main():
+    for extra in (0, 100, 1000):
+        mapa = MAPA_GASTOS if extra == 0 else _mapa_inflado(extra)
+        qtd = sum(len(p) for p in mapa.values())
+        motor = categorias._MOTORES["gasto"] if extra == 0 else _compilar(mapa)
+
+        print(f"\n{qtd} palavras-chave:")
+        antigo = _medir("loop antigo", lambda d: _loop_antigo(mapa, d))
+        novo = _medir("compilado", lambda d: _detectar(motor, d))
+        print(f"  -> {antigo / novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,32 @@
 import os
 import datetime
-from telegram import BotCommand
 from telegram.ext import (
     Application,
-    CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
     ContextTypes,
     filters,
 )
 
-from database.db import criar_tabelas
+from database.db import criar_tabelas, estatisticas_cache
+from database.db_async import encerrar as encerrar_db
 
-from handlers.menu import menu_principal
-from handlers.stats import estatisticas
-from handlers.historico import historico_mensal
-from handlers.comparacao import comparacao_mes_a_mes
-
-from handlers.relatorio import (
-    job_virada_mes,
-    relatorio_mes_passado,
-    relatorio_mes_atual,
-)
-
-from handlers.extrato import extrato, apagar
-
-from handlers.alertas import job_alertas_diarios
+# ✅ handlers são importados sob demanda (ver handlers/rotas.py)
+from handlers.rotas import comandos_menu, preguicoso, registrar_rotas
 from handlers.rapido import processar_mensagem_rapida
 
-from config import HORA_ALERTA_DIARIO, MINUTO_ALERTA_DIARIO
+from config import HORA_ALERTA_DIARIO, MINUTO_ALERTA_DIARIO, INTERVALO_RECORRENCIAS_SEG
 
 
 async def post_init(app: Application):
     criar_tabelas()
-    await app.bot.set_my_commands(
-        [
-            BotCommand("start", "Abrir menu"),
-            BotCommand("stats", "Resumo financeiro"),
-            BotCommand("historico", "Histórico mensal"),
-            BotCommand("comparar", "Comparação mês a mês"),
-            BotCommand("relatorio", "Relatório do mês passado"),
-            BotCommand("relatorio_atual", "Relatório do mês atual"),
-            BotCommand("extrato", "Ver últimos lançamentos"),
-            BotCommand("apagar", "Apagar lançamento por ID"),
-        ]
-    )
+    await app.bot.set_my_commands(comandos_menu())
+
+
+async def post_shutdown(app: Application):
+    c = estatisticas_cache()
+    print(f"🗃️ cache de resumos: {c['hits']} hits, {c['misses']} misses ({c['taxa_acerto']:.0%}), {c['despejos']} despejos")
+    await encerrar_db()
 
 
 async def _error_handler(update, context: ContextTypes.DEFAULT_TYPE):
@@ -58,45 +40,50 @@ def main():
 
     criar_tabelas()
 
-    app = Application.builder().token(token).post_init(post_init).build()
+    app = Application.builder().token(token).post_init(post_init).post_shutdown(post_shutdown).build()
     app.add_error_handler(_error_handler)
 
-    # comandos principais
-    app.add_handler(CommandHandler("start", menu_principal))
-    app.add_handler(CommandHandler("stats", estatisticas))
-    app.add_handler(CommandHandler("historico", historico_mensal))
-    app.add_handler(CommandHandler("comparar", comparacao_mes_a_mes))
-
-    # relatórios
-    app.add_handler(CommandHandler("relatorio", relatorio_mes_passado))
-    app.add_handler(CommandHandler("relatorio_atual", relatorio_mes_atual))
-
-    # ✅ extrato e apagar
-    app.add_handler(CommandHandler("extrato", extrato))
-    app.add_handler(CommandHandler("apagar", apagar))
-
-    # botões do menu
-    app.add_handler(CallbackQueryHandler(estatisticas, pattern="^stats$"))
-    app.add_handler(CallbackQueryHandler(historico_mensal, pattern="^historico$"))
-    app.add_handler(CallbackQueryHandler(comparacao_mes_a_mes, pattern="^comparar$"))
+    # comandos + botões do menu (tabela em handlers/rotas.py)
+    registrar_rotas(app)
+
+    # paginação do extrato e da busca
+    app.add_handler(CallbackQueryHandler(preguicoso("handlers.extrato:extrato_pagina"), pattern="^ext:"))
+    app.add_handler(CallbackQueryHandler(preguicoso("handlers.extrato:buscar_pagina"), pattern="^bus:"))
+
+    # extrato do banco enviado como arquivo
+    app.add_handler(
+        MessageHandler(
+            filters.Document.FileExtension("csv")
+            | filters.Document.FileExtension("ofx")
+            | filters.Document.FileExtension("qfx"),
+            preguicoso("handlers.importar:importar_arquivo"),
+        )
+    )
 
     # mensagens rápidas (inclui atalhos e entrada/gasto/salario)
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, processar_mensagem_rapida))
 
     # jobs
     app.job_queue.run_monthly(
-        callback=job_virada_mes,
+        callback=preguicoso("handlers.relatorio:job_virada_mes"),
         when=datetime.time(hour=9, minute=0),
         day=1,
         name="relatorio_virada_mes",
     )
 
     app.job_queue.run_daily(
-        callback=job_alertas_diarios,
+        callback=preguicoso("handlers.alertas:job_alertas_diarios"),
         time=datetime.time(hour=HORA_ALERTA_DIARIO, minute=MINUTO_ALERTA_DIARIO),
         name="alertas_diarios",
     )
 
+    app.job_queue.run_repeating(
+        callback=preguicoso("handlers.recorrentes:job_recorrencias"),
+        interval=INTERVALO_RECORRENCIAS_SEG,
+        first=30,
+        name="recorrencias",
+    )
+
     print("🤖 AFinance rodando...")
     app.run_polling()
 
@@ -4,12 +4,16 @@
 HORA_ALERTA_DIARIO = 8
 MINUTO_ALERTA_DIARIO = 0
 
+# de quanto em quanto tempo o job de recorrências procura lançamentos vencidos (e parcelas)
+INTERVALO_RECORRENCIAS_SEG = 15 * 60
+
 # =========================
 # FLAGS
 # =========================
 ALERTA_SALDO_NEGATIVO = True
 ALERTA_LIMITE_GASTOS = True
 ALERTA_CATEGORIAS = True
+ALERTA_ANOMALIAS = True
 
 # =========================
 # LIMITES
@@ -17,6 +21,17 @@ ALERTA_CATEGORIAS = True
 LIMITE_GASTOS_MENSAL = 500
 PERCENTUAL_AVISO = 0.80
 
+# previsão de fechamento do mês: quantos meses de histórico usa
+# e a partir de que dia do mês ela pode virar alerta
+MESES_HISTORICO_PREVISAO = 3
+DIA_MINIMO_ALERTA_PREVISAO = 5
+
+# gasto fora do padrão: só com histórico mínimo na categoria, e precisa passar
+# de média + N desvios E de X vezes a média (evita falso alarme em categoria estável)
+ANOMALIA_MIN_LANCAMENTOS = 5
+ANOMALIA_DESVIOS = 3.0
+ANOMALIA_FATOR_MINIMO = 2.0
+
 # ✅ INVESTIMENTO AUTOMÁTICO (PARA MENSAGEM DO SALÁRIO)
 INVESTIMENTO_SUGERIDO_FIXO = 800  # << você pediu 800
 
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+# =========================
+# CACHE DE RESUMOS MENSAIS
+# =========================
+# Chave: (user_id, "AAAA-MM"). Cada mês guarda vários resultados
+# ("resumo", ("top", 5), ("cat", "Mercado"), ...).
+# - LRU por (user, mês), com teto em meses + resultados guardados (~memória)
+# - invalidação exata por (user, mês), chamada DEPOIS do commit da escrita:
+#   a entrada sai do cache e fica só uma marca de "invalidado em" (também limitada)
+# - quem leu do banco só guarda se o mês não foi invalidado no meio do caminho
+#   (senão uma leitura antiga podia ficar presa no cache)
+
+
+class CacheMensal:
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self.hits = 0
+        self.misses = 0
+        self.despejos = 0
+        self._meses = OrderedDict()  # (user_id, mes) -> {chave: valor}
+        self._itens = 0
+        self._relogio = 0  # avança a cada invalidação
+        self._invalidados = OrderedDict()  # (user_id, mes) -> relógio da última invalidação
+        self._piso = 0  # marcas esquecidas: ticket anterior a isso não guarda mais nada
+        self._lock = threading.Lock()
+
+    def obter(self, user_id: int, mes: str, chave):
+        """
+        Retorna (True, valor) no hit ou (False, ticket) no miss;
+        o ticket vai de volta no guardar().
+        """
+        with self._lock:
+            itens = self._meses.get((user_id, mes))
+            if itens is not None:
+                self._meses.move_to_end((user_id, mes))
+                if chave in itens:
+                    self.hits += 1
+                    return True, itens[chave]
+
+            self.misses += 1
+            return False, self._relogio
+
+    def guardar(self, user_id: int, mes: str, chave, valor, ticket: int):
+        with self._lock:
+            if ticket < self._piso or ticket < self._invalidados.get((user_id, mes), 0):
+                return  # invalidado enquanto lia do banco
+
+            itens = self._meses.get((user_id, mes))
+            if itens is None:
+                itens = self._meses[(user_id, mes)] = {}
+            else:
+                self._meses.move_to_end((user_id, mes))
+
+            if chave not in itens:
+                self._itens += 1
+            itens[chave] = valor
+
+            # cada mês conta 1 além dos seus resultados
+            while self._itens + len(self._meses) > self.max_itens and len(self._meses) > 1:
+                _, despejado = self._meses.popitem(last=False)
+                self._itens -= len(despejado)
+                self.despejos += 1
+
+    def invalidar(self, user_id: int, mes: str):
+        with self._lock:
+            self._relogio += 1
+            itens = self._meses.pop((user_id, mes), None)
+            if itens is not None:
+                self._itens -= len(itens)
+
+            self._invalidados.pop((user_id, mes), None)
+            self._invalidados[(user_id, mes)] = self._relogio
+            if len(self._invalidados) > self.max_itens:
+                _, relogio = self._invalidados.popitem(last=False)
+                self._piso = max(self._piso, relogio)
+
+    def limpar(self):
+        with self._lock:
+            self._relogio += 1
+            self._piso = self._relogio
+            self._meses.clear()
+            self._invalidados.clear()
+            self._itens = 0
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": (self.hits / total) if total else 0.0,
+                "despejos": self.despejos,
+                "meses": len(self._meses),
+                "itens": self._itens,
+            }
@@ -1,83 +1,1036 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from database.cache import CacheMensal
+from utils.periodos import dia_no_mes, proximo_mes, proxima_execucao
+
 TZ = ZoneInfo("America/Cuiaba")
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "database.db")
 
+# coluna gerada (mes) pede SQLite 3.31+; nada aqui usa RETURNING (3.35), então
+# roda no 3.34 do Debian 11 / imagens python:*-bullseye
+SQLITE_MINIMO = (3, 31, 0)
+
+# =========================
+# CONEXÕES
+# =========================
+# 1 conexão de escrita (serializada por lock) + pool pequeno de leitura.
+# Em WAL os leitores não bloqueiam o escritor (e vice-versa).
+TAMANHO_POOL_LEITURA = 4
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # em WAL: seguro contra corrupção, fsync só no checkpoint
+    "PRAGMA cache_size=-16000",  # ~16 MB por conexão
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+_lock_escrita = threading.Lock()
+_lock_pool = threading.Lock()
+_escritor = None
+_leitores = queue.LifoQueue()
+_total_leitores = 0
+
+# =========================
+# CACHE DOS RESUMOS MENSAIS
+# =========================
+# resumo_mes / top_categorias_mes / total_gasto_categoria_mes por (user, mês).
+# Mês fechado quase nunca muda, então depois da 1ª leitura não volta no SQLite.
+MAX_ITENS_CACHE = 20000  # resultados pequenos (tupla / top 5): poucos MB no total
+
+_cache = CacheMensal(MAX_ITENS_CACHE)
 
-def _conectar():
-    conn = sqlite3.connect(DB_PATH)
+
+def _abrir_conexao():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+def _conexao_escrita():
+    # só é chamada com _lock_escrita na mão
+    global _escritor
+    if _escritor is None:
+        _escritor = _abrir_conexao()
+    return _escritor
+
+
+def _pegar_leitor():
+    global _total_leitores
+    try:
+        return _leitores.get_nowait()
+    except queue.Empty:
+        pass
+
+    with _lock_pool:
+        if _total_leitores < TAMANHO_POOL_LEITURA:
+            _total_leitores += 1
+            return _abrir_conexao()
+
+    # pool cheio: espera alguém devolver
+    return _leitores.get()
+
+
+@contextmanager
+def _leitura():
+    """
+    Empresta uma conexão do pool de leitura (devolvida no final).
+    """
+    conn = _pegar_leitor()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        _leitores.put(conn)
+
+
+@contextmanager
+def _escrita():
+    """
+    Conexão única de escrita: serializa os writers e faz commit/rollback sozinha.
+    """
+    with _lock_escrita:
+        conn = _conexao_escrita()
+        with conn:
+            yield conn
+
+
+def fechar_conexoes():
+    """
+    Fecha o escritor e todo o pool (chamado no shutdown do bot).
+    """
+    global _escritor, _total_leitores
+    with _lock_escrita, _lock_pool:
+        if _escritor is not None:
+            _escritor.execute("PRAGMA optimize")
+            _escritor.close()
+            _escritor = None
+
+        while True:
+            try:
+                _leitores.get_nowait().close()
+            except queue.Empty:
+                break
+        _total_leitores = 0
+
+
+def estatisticas_cache() -> dict:
+    return _cache.estatisticas()
+
+
+def _com_cache(user_id: int, meses, chave, consultar):
+    """
+    Read-through: devolve {(ano, mes): valor} pegando do cache o que tiver
+    e buscando o resto com UMA chamada consultar(inicio, fim).
+    """
+    resultado = {}
+    faltando = {}
+    for am in meses:
+        achou, valor = _cache.obter(user_id, _prefixo(*am), chave)
+        if achou:
+            resultado[am] = valor
+        else:
+            faltando[am] = valor  # ticket
+
+    if faltando:
+        lidos = consultar(min(faltando), max(faltando))
+        for am, ticket in faltando.items():
+            resultado[am] = lidos[am]
+            _cache.guardar(user_id, _prefixo(*am), chave, lidos[am], ticket)
+
+    return {am: resultado[am] for am in meses}
+
+
+def _invalidar_cache(pares):
+    """
+    pares = {(user_id, "AAAA-MM"), ...} tocados por uma escrita JÁ commitada
+    (invalidar antes do commit deixaria um leitor guardar o valor velho).
+    """
+    for user_id, mes in pares:
+        _cache.invalidar(user_id, mes)
+
+
+def _colunas(cur, tabela: str) -> set[str]:
+    # table_xinfo também lista colunas geradas
+    return {r["name"] for r in cur.execute(f"PRAGMA table_xinfo({tabela})").fetchall()}
+
+
+def _prefixo(ano: int, mes: int) -> str:
+    return f"{ano:04d}-{mes:02d}"
+
+
+def _prefixo_seguinte(ano: int, mes: int) -> str:
+    if mes == 12:
+        return _prefixo(ano + 1, 1)
+    return _prefixo(ano, mes + 1)
+
+
+# =========================
+# AGREGADOS MATERIALIZADOS
+# =========================
+# resumo_mensal guarda, por (user_id, mes, tipo, categoria), o total em centavos
+# e a quantidade de lançamentos. É mantido por triggers na mesma transação do
+# INSERT/DELETE/UPDATE em transacoes, então qualquer caminho de escrita fica coberto.
+_CENTAVOS_NEW = "CAST(ROUND(NEW.valor * 100) AS INTEGER)"
+_CENTAVOS_OLD = "CAST(ROUND(OLD.valor * 100) AS INTEGER)"
+
+_SQL_SOMA_RESUMO = f"""
+    INSERT INTO resumo_mensal (user_id, mes, tipo, categoria, total_centavos, qtd)
+    VALUES (NEW.user_id, NEW.mes, NEW.tipo, NEW.categoria, {_CENTAVOS_NEW}, 1)
+    ON CONFLICT(user_id, mes, tipo, categoria) DO UPDATE SET
+        total_centavos = total_centavos + excluded.total_centavos,
+        qtd = qtd + 1;
+"""
+
+_SQL_SUBTRAI_RESUMO = f"""
+    UPDATE resumo_mensal
+    SET total_centavos = total_centavos - {_CENTAVOS_OLD}, qtd = qtd - 1
+    WHERE user_id=OLD.user_id AND mes=OLD.mes AND tipo=OLD.tipo AND categoria=OLD.categoria;
+    DELETE FROM resumo_mensal
+    WHERE user_id=OLD.user_id AND mes=OLD.mes AND tipo=OLD.tipo AND categoria=OLD.categoria
+      AND qtd <= 0;
+"""
+
+_TRIGGERS_RESUMO = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_mensal_ins AFTER INSERT ON transacoes
+    BEGIN
+        {_SQL_SOMA_RESUMO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_mensal_del AFTER DELETE ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_RESUMO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_mensal_upd
+    AFTER UPDATE OF user_id, tipo, valor, categoria, criado_em ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_RESUMO}
+        {_SQL_SOMA_RESUMO}
+    END
+    """,
+)
+
+# saldos: saldo acumulado por usuário (entradas - gastos), em centavos.
+_SINAL_NEW = "CASE NEW.tipo WHEN 'entrada' THEN 1 WHEN 'gasto' THEN -1 ELSE 0 END"
+_SINAL_OLD = "CASE OLD.tipo WHEN 'entrada' THEN 1 WHEN 'gasto' THEN -1 ELSE 0 END"
+
+_SQL_SOMA_SALDO = f"""
+    INSERT INTO saldos (user_id, saldo_centavos)
+    VALUES (NEW.user_id, ({_SINAL_NEW}) * {_CENTAVOS_NEW})
+    ON CONFLICT(user_id) DO UPDATE SET
+        saldo_centavos = saldo_centavos + excluded.saldo_centavos;
+"""
+
+_SQL_SUBTRAI_SALDO = f"""
+    UPDATE saldos
+    SET saldo_centavos = saldo_centavos - ({_SINAL_OLD}) * {_CENTAVOS_OLD}
+    WHERE user_id=OLD.user_id;
+"""
+
+_TRIGGERS_SALDO = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_saldos_ins AFTER INSERT ON transacoes
+    BEGIN
+        {_SQL_SOMA_SALDO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_saldos_del AFTER DELETE ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_SALDO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_saldos_upd AFTER UPDATE OF user_id, tipo, valor ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_SALDO}
+        {_SQL_SOMA_SALDO}
+    END
+    """,
+)
+
+# versão dos dados de cada (user, mês): muda a cada lançamento que entra/sai do mês.
+# Relatório renderizado só vale enquanto a versão dele for a atual.
+_SQL_VERSAO_MES = """
+    INSERT INTO versoes_mes (user_id, mes, versao)
+    VALUES ({0}.user_id, {0}.mes, 1)
+    ON CONFLICT(user_id, mes) DO UPDATE SET versao = versao + 1;
+"""
+
+_TRIGGERS_VERSAO = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_versoes_mes_ins AFTER INSERT ON transacoes
+    BEGIN
+        {_SQL_VERSAO_MES.format("NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_versoes_mes_del AFTER DELETE ON transacoes
+    BEGIN
+        {_SQL_VERSAO_MES.format("OLD")}
+    END
+    """,
+    # correção de categoria/valor também muda o relatório daquele mês
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_versoes_mes_upd
+    AFTER UPDATE OF user_id, tipo, valor, categoria, criado_em ON transacoes
+    BEGIN
+        {_SQL_VERSAO_MES.format("OLD")}
+        {_SQL_VERSAO_MES.format("NEW")}
+    END
+    """,
+)
+
+# busca textual (FTS5) em descricao + categoria. O índice lê da view transacoes_busca,
+# que acrescenta o token do dono ("u<user_id>"): a busca casa dono:uX AND termo e o
+# FTS cruza as listas invertidas, sem varrer os lançamentos dos outros usuários.
+_SQL_FTS_INSERE = """
+    INSERT INTO transacoes_fts (rowid, descricao, categoria, dono)
+    VALUES (NEW.id, NEW.descricao, NEW.categoria, 'u' || NEW.user_id);
+"""
+
+_SQL_FTS_REMOVE = """
+    INSERT INTO transacoes_fts (transacoes_fts, rowid, descricao, categoria, dono)
+    VALUES ('delete', OLD.id, OLD.descricao, OLD.categoria, 'u' || OLD.user_id);
+"""
+
+_TRIGGERS_FTS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_ins AFTER INSERT ON transacoes
+    BEGIN
+        {_SQL_FTS_INSERE}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_del AFTER DELETE ON transacoes
+    BEGIN
+        {_SQL_FTS_REMOVE}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_upd AFTER UPDATE OF user_id, descricao, categoria ON transacoes
+    BEGIN
+        {_SQL_FTS_REMOVE}
+        {_SQL_FTS_INSERE}
+    END
+    """,
+)
+
+# estatísticas de cada (user, categoria) de gasto: n, média e M2 (soma dos quadrados
+# dos desvios) pelo método de Welford, em centavos. Dá pra pontuar um gasto novo em
+# O(1) sem reler o histórico. Compra parcelada conta uma vez só (pela 1ª parcela).
+_CONTA_ESTATISTICA = "{0}.tipo='gasto' AND ({0}.grupo_id IS NULL OR {0}.grupo_id = {0}.id)"
+
+_SQL_SOMA_ESTATISTICA = f"""
+    INSERT INTO estatisticas_categoria (user_id, categoria, n, media, m2)
+    SELECT NEW.user_id, NEW.categoria, 1, {_CENTAVOS_NEW} * 1.0, 0.0
+    WHERE {_CONTA_ESTATISTICA.format("NEW")}
+    ON CONFLICT(user_id, categoria) DO UPDATE SET
+        n = n + 1,
+        media = media + (excluded.media - media) / (n + 1),
+        m2 = m2 + (excluded.media - media) * (excluded.media - media - (excluded.media - media) / (n + 1));
+"""
+
+# Welford ao contrário (apagar/corrigir lançamento)
+_SQL_SUBTRAI_ESTATISTICA = f"""
+    UPDATE estatisticas_categoria
+    SET n = n - 1,
+        media = CASE WHEN n > 1 THEN (media * n - {_CENTAVOS_OLD}) / (n - 1) ELSE 0.0 END,
+        m2 = CASE WHEN n > 1
+                  THEN MAX(m2 - ({_CENTAVOS_OLD} - media) * ({_CENTAVOS_OLD} - (media * n - {_CENTAVOS_OLD}) / (n - 1)), 0.0)
+                  ELSE 0.0 END
+    WHERE user_id=OLD.user_id AND categoria=OLD.categoria AND {_CONTA_ESTATISTICA.format("OLD")};
+    DELETE FROM estatisticas_categoria
+    WHERE user_id=OLD.user_id AND categoria=OLD.categoria AND n <= 0;
+"""
+
+_TRIGGERS_ESTATISTICA = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_estatisticas_categoria_ins AFTER INSERT ON transacoes
+    BEGIN
+        {_SQL_SOMA_ESTATISTICA}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_estatisticas_categoria_del AFTER DELETE ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_ESTATISTICA}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_estatisticas_categoria_upd
+    AFTER UPDATE OF user_id, tipo, valor, categoria ON transacoes
+    BEGIN
+        {_SQL_SUBTRAI_ESTATISTICA}
+        {_SQL_SOMA_ESTATISTICA}
+    END
+    """,
+)
+
+_SQL_SALDO_ESPERADO = """
+    SELECT user_id,
+           SUM(CASE tipo WHEN 'entrada' THEN 1 WHEN 'gasto' THEN -1 ELSE 0 END
+               * CAST(ROUND(valor * 100) AS INTEGER)) as saldo_centavos
+    FROM transacoes
+    GROUP BY user_id
+"""
+
+_SQL_RESUMO_ESPERADO = """
+    SELECT user_id, mes, tipo, categoria,
+           SUM(CAST(ROUND(valor * 100) AS INTEGER)) as total_centavos,
+           COUNT(*) as qtd
+    FROM transacoes
+    GROUP BY user_id, mes, tipo, categoria
+"""
+
+
+_SQL_ESTATISTICA_ESPERADA = f"""
+    SELECT user_id, categoria, COUNT(*) as n, AVG(x) as media,
+           SUM((x - media_categoria) * (x - media_categoria)) as m2
+    FROM (
+        SELECT user_id, categoria, CAST(ROUND(valor * 100) AS INTEGER) * 1.0 as x,
+               AVG(CAST(ROUND(valor * 100) AS INTEGER)) OVER (PARTITION BY user_id, categoria) as media_categoria
+        FROM transacoes
+        WHERE {_CONTA_ESTATISTICA.format("transacoes")}
+    )
+    GROUP BY user_id, categoria
+"""
+
+
+def _tabela_existe(cur, tabela: str) -> bool:
+    row = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name=?",
+        (tabela,),
+    ).fetchone()
+    return row is not None
+
+
 def criar_tabelas():
-    conn = _conectar()
-    cur = conn.cursor()
+    if sqlite3.sqlite_version_info < SQLITE_MINIMO:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} é antigo demais: o AFinance precisa do "
+            f"{'.'.join(map(str, SQLITE_MINIMO))} ou mais novo."
+        )
 
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS transacoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            tipo TEXT NOT NULL,
-            valor REAL NOT NULL,
-            categoria TEXT NOT NULL,
-            descricao TEXT,
-            criado_em TEXT NOT NULL
+    with _escrita() as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                valor REAL NOT NULL,
+                categoria TEXT NOT NULL,
+                descricao TEXT,
+                criado_em TEXT NOT NULL,
+                origem_id TEXT,
+                grupo_id INTEGER,
+                mes TEXT GENERATED ALWAYS AS (substr(criado_em, 1, 7)) VIRTUAL
+            )
+            """
         )
-        """
-    )
 
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS alertas_enviados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            alerta TEXT NOT NULL,
-            periodo TEXT NOT NULL,
-            enviado_em TEXT NOT NULL,
-            UNIQUE(user_id, alerta, periodo)
+        # bancos antigos: coluna 'mes' (AAAA-MM) derivada do criado_em
+        if "mes" not in _colunas(cur, "transacoes"):
+            cur.execute(
+                "ALTER TABLE transacoes ADD COLUMN mes TEXT GENERATED ALWAYS AS (substr(criado_em, 1, 7)) VIRTUAL"
+            )
+
+        # id do lançamento no extrato importado (FITID / hash da linha): evita importar 2x
+        if "origem_id" not in _colunas(cur, "transacoes"):
+            cur.execute("ALTER TABLE transacoes ADD COLUMN origem_id TEXT")
+        cur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_transacoes_origem "
+            "ON transacoes(user_id, origem_id) WHERE origem_id IS NOT NULL"
         )
-        """
-    )
 
-    conn.commit()
-    conn.close()
+        # compra parcelada: todas as parcelas apontam pro id da 1ª (o /apagar leva o grupo inteiro)
+        if "grupo_id" not in _colunas(cur, "transacoes"):
+            cur.execute("ALTER TABLE transacoes ADD COLUMN grupo_id INTEGER")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transacoes_grupo "
+            "ON transacoes(user_id, grupo_id) WHERE grupo_id IS NOT NULL"
+        )
+
+        # parcelas que ainda não venceram: fora de transacoes até o dia (lancar_parcelas_vencidas)
+        parcelas_novo = not _tabela_existe(cur, "parcelas_futuras")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parcelas_futuras (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                grupo_id INTEGER NOT NULL,
+                valor_centavos INTEGER NOT NULL,
+                categoria TEXT NOT NULL,
+                descricao TEXT,
+                vence_em TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_parcelas_futuras_vence "
+            "ON parcelas_futuras(vence_em)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_parcelas_futuras_grupo "
+            "ON parcelas_futuras(user_id, grupo_id)"
+        )
+        # banco que já gravou parcelas futuras direto em transacoes: tira de lá
+        if parcelas_novo:
+            agora = datetime.now(TZ).isoformat()
+            cur.execute(
+                """
+                INSERT INTO parcelas_futuras (user_id, grupo_id, valor_centavos, categoria, descricao, vence_em)
+                SELECT user_id, grupo_id, CAST(ROUND(valor * 100) AS INTEGER), categoria, descricao, criado_em
+                FROM transacoes
+                WHERE grupo_id IS NOT NULL AND id != grupo_id AND criado_em > ?
+                """,
+                (agora,),
+            )
+            cur.execute(
+                "DELETE FROM transacoes WHERE grupo_id IS NOT NULL AND id != grupo_id AND criado_em > ?",
+                (agora,),
+            )
+
+        # ✅ índices: toda consulta mensal vira range seek (o valor no fim deixa o SUM coberto pelo índice)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transacoes_user_tipo_mes_cat "
+            "ON transacoes(user_id, tipo, mes, categoria, valor)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transacoes_user_criado "
+            "ON transacoes(user_id, criado_em)"
+        )
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS alertas_enviados (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                alerta TEXT NOT NULL,
+                periodo TEXT NOT NULL,
+                enviado_em TEXT NOT NULL,
+                UNIQUE(user_id, alerta, periodo)
+            )
+            """
+        )
+
+        resumo_novo = not _tabela_existe(cur, "resumo_mensal")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resumo_mensal (
+                user_id INTEGER NOT NULL,
+                mes TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                total_centavos INTEGER NOT NULL DEFAULT 0,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, mes, tipo, categoria)
+            ) WITHOUT ROWID
+            """
+        )
+        # varreduras por mês de todos os usuários (jobs diário e de virada de mês)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_resumo_mensal_mes "
+            "ON resumo_mensal(mes, tipo, user_id, categoria, total_centavos)"
+        )
+        for trigger in _TRIGGERS_RESUMO:
+            cur.execute(trigger)
+
+        # banco antigo: popula o agregado a partir do histórico
+        if resumo_novo:
+            _reconstruir_resumo_mensal(cur)
+
+        saldos_novo = not _tabela_existe(cur, "saldos")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS saldos (
+                user_id INTEGER PRIMARY KEY,
+                saldo_centavos INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        for trigger in _TRIGGERS_SALDO:
+            cur.execute(trigger)
+
+        if saldos_novo:
+            _reconstruir_saldos(cur)
+
+        # ✅ detecção de gasto fora do padrão (Welford por categoria)
+        estatisticas_novo = not _tabela_existe(cur, "estatisticas_categoria")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS estatisticas_categoria (
+                user_id INTEGER NOT NULL,
+                categoria TEXT NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                media REAL NOT NULL DEFAULT 0,
+                m2 REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, categoria)
+            ) WITHOUT ROWID
+            """
+        )
+        for trigger in _TRIGGERS_ESTATISTICA:
+            cur.execute(trigger)
+
+        if estatisticas_novo:
+            _reconstruir_estatisticas_categoria(cur)
+
+        # categorias aprendidas com as correções do usuário (termo da descrição -> categoria)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS categorias_usuario (
+                user_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                termo TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                PRIMARY KEY (user_id, tipo, termo)
+            ) WITHOUT ROWID
+            """
+        )
+
+        # relatórios de meses fechados já renderizados (válidos enquanto a versão bater)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS versoes_mes (
+                user_id INTEGER NOT NULL,
+                mes TEXT NOT NULL,
+                versao INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, mes)
+            ) WITHOUT ROWID
+            """
+        )
+        for trigger in _TRIGGERS_VERSAO:
+            cur.execute(trigger)
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS relatorios_renderizados (
+                user_id INTEGER NOT NULL,
+                mes TEXT NOT NULL,
+                versao INTEGER NOT NULL,
+                texto TEXT NOT NULL,
+                PRIMARY KEY (user_id, mes)
+            ) WITHOUT ROWID
+            """
+        )
+
+        # ✅ busca textual (/buscar)
+        cur.execute(
+            """
+            CREATE VIEW IF NOT EXISTS transacoes_busca AS
+            SELECT id, descricao, categoria, 'u' || user_id as dono
+            FROM transacoes
+            """
+        )
+        fts_novo = not _tabela_existe(cur, "transacoes_fts")
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS transacoes_fts USING fts5(
+                descricao, categoria, dono,
+                content='transacoes_busca',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        for trigger in _TRIGGERS_FTS:
+            cur.execute(trigger)
+
+        # banco antigo: indexa o histórico
+        if fts_novo:
+            cur.execute("INSERT INTO transacoes_fts (transacoes_fts) VALUES ('rebuild')")
+
+        # ✅ lançamentos recorrentes (assinaturas, aluguel, salário...)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recorrencias (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                valor_centavos INTEGER NOT NULL,
+                categoria TEXT NOT NULL,
+                descricao TEXT,
+                cadencia TEXT NOT NULL,
+                dia INTEGER NOT NULL,
+                proxima_execucao TEXT NOT NULL,
+                criado_em TEXT NOT NULL
+            )
+            """
+        )
+        # o job só lê o que venceu: range seek aqui, nunca varre todos os modelos
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_recorrencias_proxima "
+            "ON recorrencias(proxima_execucao)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_recorrencias_user "
+            "ON recorrencias(user_id)"
+        )
 
 
 def inserir_transacao(user_id: int, tipo: str, valor_centavos: int, categoria: str, descricao: str | None):
-    valor_reais = float(valor_centavos) / 100.0
+    return inserir_transacoes([(user_id, tipo, valor_centavos, categoria, descricao)])[0]
+
+
+def inserir_transacoes(linhas) -> list[int]:
+    """
+    Insere várias transações num único commit (executemany).
+    linhas = [(user_id, tipo, valor_centavos, categoria, descricao), ...]
+    Retorna os ids na mesma ordem.
+    """
+    return [r["id"] for r in registrar_transacoes(linhas)]
+
+
+def registrar_transacoes(linhas) -> list[dict]:
+    """
+    Igual ao inserir_transacoes, mas já devolve, lidos na MESMA transação do insert
+    (sem outra ida ao banco pro insight/alerta), de cada gasto:
+    - o total do mês da categoria
+    - o histórico da categoria ANTES dele (n, média e desvio padrão, em centavos),
+      pra pontuar se é um gasto fora do padrão
+    Retorna: [{id, total_categoria_centavos, historico}, ...] na ordem das linhas
+    (total_categoria_centavos=None e historico=None nas entradas; historico=None
+    também no 1º gasto da categoria).
+    """
+    linhas = list(linhas)
     criado_em = datetime.now(TZ).isoformat()
+    params = [
+        (user_id, tipo, float(valor_centavos) / 100.0, categoria, descricao, criado_em)
+        for user_id, tipo, valor_centavos, categoria, descricao in linhas
+    ]
+    if not params:
+        return []
 
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (user_id, tipo, valor_reais, categoria, descricao, criado_em),
-    )
-    tid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return tid
+    pares = sorted({(p[0], p[3]) for p in params if p[1] == "gasto"})
+    valores = ",".join("(?, ?)" for _ in pares)
+    chaves = [v for par in pares for v in par]
+
+    with _escrita() as conn:
+        estados = {}
+        if pares:
+            rows = conn.execute(
+                f"""
+                SELECT user_id, categoria, n, media, m2
+                FROM estatisticas_categoria
+                WHERE (user_id, categoria) IN (VALUES {valores})
+                """,
+                chaves,
+            ).fetchall()
+            estados = {(r["user_id"], r["categoria"]): (r["n"], r["media"], r["m2"]) for r in rows}
+
+        conn.executemany(
+            """
+            INSERT INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            params,
+        )
+        # escritor único + AUTOINCREMENT: os ids do lote são consecutivos
+        ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+        # totais já atualizados pelos triggers do resumo_mensal
+        totais = {}
+        if pares:
+            rows = conn.execute(
+                f"""
+                SELECT user_id, categoria, total_centavos
+                FROM resumo_mensal
+                WHERE mes=? AND tipo='gasto'
+                  AND (user_id, categoria) IN (VALUES {valores})
+                """,
+                (criado_em[:7], *chaves),
+            ).fetchall()
+            totais = {(r["user_id"], r["categoria"]): r["total_centavos"] for r in rows}
+
+    _invalidar_cache({(p[0], criado_em[:7]) for p in params})
+
+    # histórico "antes desta linha": o mesmo passo de Welford dos triggers, linha a linha do lote
+    historicos = [None] * len(params)
+    for i, (user_id, tipo, valor_centavos, categoria, _) in enumerate(linhas):
+        if tipo != "gasto":
+            continue
+        n, media, m2 = estados.get((user_id, categoria), (0, 0.0, 0.0))
+        if n:
+            desvio = (m2 / (n - 1)) ** 0.5 if n > 1 else 0.0
+            historicos[i] = {"n": n, "media_centavos": media, "desvio_centavos": desvio}
+        delta = int(valor_centavos) - media
+        media += delta / (n + 1)
+        estados[(user_id, categoria)] = (n + 1, media, m2 + delta * (int(valor_centavos) - media))
+
+    # total "até esta linha": tira do total final os gastos que vieram depois no lote
+    primeiro = ultimo - len(params) + 1
+    resultado = [None] * len(params)
+    for i in range(len(linhas) - 1, -1, -1):
+        user_id, tipo, valor_centavos, categoria, _ = linhas[i]
+        total = None
+        if tipo == "gasto":
+            total = totais.get((user_id, categoria), 0)
+            totais[(user_id, categoria)] = total - int(valor_centavos)
+        resultado[i] = {"id": primeiro + i, "total_categoria_centavos": total, "historico": historicos[i]}
+    return resultado
+
+
+def registrar_parcelas(user_id: int, valor_centavos: int, n: int, categoria: str, descricao: str) -> dict:
+    """
+    Compra parcelada: a 1ª parcela entra hoje em transacoes; as outras N-1 (uma por mês)
+    esperam em parcelas_futuras e só viram lançamento quando vencem (lancar_parcelas_vencidas).
+    Assim saldo, extrato, busca, resumo e alertas só contam parcela que já venceu.
+    Centavos que sobram da divisão vão pras primeiras.
+    Retorna: {grupo_id, parcelas: [{valor_centavos, criado_em}], total_categoria_centavos}
+    (total do mês atual da categoria, já com a 1ª parcela)
+    """
+    agora = datetime.now(TZ)
+    base, resto = divmod(int(valor_centavos), n)
+
+    parcelas = []
+    ano, mes = agora.year, agora.month
+    for i in range(n):
+        vencimento = dia_no_mes(ano, mes, agora.day)
+        criado_em = agora.replace(year=vencimento.year, month=vencimento.month, day=vencimento.day).isoformat()
+        parcelas.append((base + (1 if i < resto else 0), criado_em))
+        ano, mes = proximo_mes(ano, mes)
+
+    with _escrita() as conn:
+        # escritor único + AUTOINCREMENT: o próximo id é seq + 1 -> vira o id do grupo
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='transacoes'").fetchone()
+        grupo_id = (seq[0] if seq else 0) + 1
+
+        valor, criado_em = parcelas[0]
+        conn.execute(
+            """
+            INSERT INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em, grupo_id)
+            VALUES (?, 'gasto', ?, ?, ?, ?, ?)
+            """,
+            (user_id, valor / 100.0, categoria, f"{descricao} (1/{n})", criado_em, grupo_id),
+        )
+        conn.executemany(
+            """
+            INSERT INTO parcelas_futuras (user_id, grupo_id, valor_centavos, categoria, descricao, vence_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (user_id, grupo_id, valor, categoria, f"{descricao} ({i}/{n})", criado_em)
+                for i, (valor, criado_em) in enumerate(parcelas[1:], start=2)
+            ],
+        )
+        row = conn.execute(
+            """
+            SELECT total_centavos FROM resumo_mensal
+            WHERE user_id=? AND mes=? AND tipo='gasto' AND categoria=?
+            """,
+            (user_id, criado_em[:7], categoria),
+        ).fetchone()
+
+    _invalidar_cache({(user_id, criado_em[:7])})
+
+    return {
+        "grupo_id": grupo_id,
+        "parcelas": [{"valor_centavos": valor, "criado_em": criado_em} for valor, criado_em in parcelas],
+        "total_categoria_centavos": row["total_centavos"] if row else 0,
+    }
+
+
+def lancar_parcelas_vencidas(agora: str, limite: int = 500) -> list[dict]:
+    """
+    Move um lote de parcelas vencidas (vence_em <= agora) pra transacoes numa transação só
+    (criado_em = vencimento, mesmo grupo_id da compra). Lista vazia = nada mais vencido.
+    Retorna: [{user_id, transacao_id, valor_centavos, categoria, descricao, data}, ...]
+    """
+    with _escrita() as conn:
+        vencidas = conn.execute(
+            """
+            SELECT id, user_id, grupo_id, valor_centavos, categoria, descricao, vence_em
+            FROM parcelas_futuras
+            WHERE vence_em <= ?
+            ORDER BY vence_em
+            LIMIT ?
+            """,
+            (agora, limite),
+        ).fetchall()
+        if not vencidas:
+            return []
+
+        conn.executemany(
+            """
+            INSERT INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em, grupo_id)
+            VALUES (?, 'gasto', ?, ?, ?, ?, ?)
+            """,
+            [
+                (r["user_id"], r["valor_centavos"] / 100.0, r["categoria"], r["descricao"], r["vence_em"], r["grupo_id"])
+                for r in vencidas
+            ],
+        )
+        # escritor único + AUTOINCREMENT: os ids do lote são consecutivos
+        ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.executemany("DELETE FROM parcelas_futuras WHERE id=?", [(r["id"],) for r in vencidas])
+
+    _invalidar_cache({(r["user_id"], r["vence_em"][:7]) for r in vencidas})
+
+    primeiro = ultimo - len(vencidas) + 1
+    return [
+        {
+            "user_id": r["user_id"],
+            "transacao_id": primeiro + i,
+            "valor_centavos": r["valor_centavos"],
+            "categoria": r["categoria"],
+            "descricao": r["descricao"],
+            "data": r["vence_em"][:10],
+        }
+        for i, r in enumerate(vencidas)
+    ]
+
+
+# parâmetros por consulta: SQLite < 3.32 limita em 999
+_MAX_PARAMS_CONSULTA = 900
+
+
+def importar_transacoes(linhas) -> tuple[int, int]:
+    """
+    Grava um bloco do extrato importado num commit só.
+    linhas = [(user_id, tipo, valor_centavos, categoria, descricao, criado_em, origem_id), ...]
+    - já importado antes (mesmo user_id + origem_id): ignorado
+    - provavelmente já lançado à mão (mesmo user, tipo, dia e valor, sem origem_id):
+      ignorado, e cada lançamento manual "cobre" uma linha só do extrato
+    Retorna: (quantas entraram, quantas bateram com lançamento manual)
+    """
+    linhas = list(linhas)
+    if not linhas:
+        return 0, 0
+
+    with _escrita() as conn:
+        # 1) origem_id já gravado fica de fora antes do casamento (não gasta lançamento manual)
+        chaves = sorted({(l[0], l[6]) for l in linhas})
+        importadas = set()
+        passo = _MAX_PARAMS_CONSULTA // 2
+        for k in range(0, len(chaves), passo):
+            bloco = chaves[k:k + passo]
+            rows = conn.execute(
+                f"""
+                SELECT user_id, origem_id FROM transacoes
+                WHERE (user_id, origem_id) IN (VALUES {",".join("(?, ?)" for _ in bloco)})
+                """,
+                [v for par in bloco for v in par],
+            ).fetchall()
+            importadas.update((r["user_id"], r["origem_id"]) for r in rows)
+        linhas = [l for l in linhas if (l[0], l[6]) not in importadas]
+
+        # 2) lançamentos manuais no intervalo de dias do bloco (índice user_id, criado_em)
+        manuais = {}
+        for user_id in {l[0] for l in linhas}:
+            dias = [l[5][:10] for l in linhas if l[0] == user_id]
+            rows = conn.execute(
+                """
+                SELECT tipo, substr(criado_em, 1, 10) as dia,
+                       CAST(ROUND(valor * 100) AS INTEGER) as centavos, COUNT(*) as qtd
+                FROM transacoes
+                WHERE user_id=? AND origem_id IS NULL
+                  AND criado_em >= ? AND criado_em < ?
+                GROUP BY tipo, dia, centavos
+                """,
+                (user_id, min(dias), max(dias) + "~"),  # "~" > qualquer hora do último dia
+            ).fetchall()
+            for r in rows:
+                manuais[(user_id, r["tipo"], r["dia"], r["centavos"])] = r["qtd"]
+
+        params = []
+        ja_lancadas = 0
+        for user_id, tipo, valor_centavos, categoria, descricao, criado_em, origem_id in linhas:
+            chave = (user_id, tipo, criado_em[:10], int(valor_centavos))
+            if manuais.get(chave):
+                manuais[chave] -= 1
+                ja_lancadas += 1
+                continue
+            params.append((user_id, tipo, float(valor_centavos) / 100.0, categoria, descricao, criado_em, origem_id))
+
+        novas = 0
+        if params:
+            novas = conn.executemany(
+                """
+                INSERT OR IGNORE INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em, origem_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                params,
+            ).rowcount
+
+    _invalidar_cache({(p[0], p[5][:7]) for p in params})
+    return novas, ja_lancadas
 
 
 def listar_usuarios():
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT user_id FROM transacoes")
-    rows = cur.fetchall()
-    conn.close()
+    with _leitura() as conn:
+        rows = conn.execute("SELECT DISTINCT user_id FROM transacoes").fetchall()
     return [int(r["user_id"]) for r in rows]
 
 
+def _meses_entre(inicio: tuple[int, int], fim: tuple[int, int]):
+    ano, mes = inicio
+    while (ano, mes) <= fim:
+        yield ano, mes
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def resumo_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int]):
+    """
+    Resumo de vários meses numa consulta só (lê o agregado resumo_mensal).
+    inicio/fim = (ano, mes), inclusivos.
+    Retorna: {(ano, mes): (entradas, gastos_totais, investimentos)} em ordem,
+    com zeros nos meses sem lançamento.
+    """
+    return _com_cache(
+        user_id,
+        list(_meses_entre(inicio, fim)),
+        "resumo",
+        lambda ini, fim_: _consultar_resumo_meses(user_id, ini, fim_),
+    )
+
+
+def _consultar_resumo_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int]):
+    with _leitura() as conn:
+        rows = conn.execute(
+            """
+            SELECT mes,
+                   COALESCE(SUM(CASE WHEN tipo='entrada' THEN total_centavos END), 0) as entradas,
+                   COALESCE(SUM(CASE WHEN tipo='gasto' THEN total_centavos END), 0) as gastos,
+                   COALESCE(SUM(CASE WHEN tipo='gasto' AND categoria='Investimentos' THEN total_centavos END), 0) as investimentos
+            FROM resumo_mensal
+            WHERE user_id = ?
+              AND mes BETWEEN ? AND ?
+            GROUP BY mes
+            """,
+            (user_id, _prefixo(*inicio), _prefixo(*fim)),
+        ).fetchall()
+
+    por_mes = {r["mes"]: r for r in rows}
+    resultado = {}
+    for ano, mes in _meses_entre(inicio, fim):
+        r = por_mes.get(_prefixo(ano, mes))
+        if r is None:
+            resultado[(ano, mes)] = (0.0, 0.0, 0.0)
+        else:
+            resultado[(ano, mes)] = (r["entradas"] / 100.0, r["gastos"] / 100.0, r["investimentos"] / 100.0)
+    return resultado
+
+
 def resumo_mes(user_id: int, ano: int, mes: int):
     """
     Retorna: entradas, gastos_totais, investimentos (em REAIS)
@@ -86,205 +1039,906 @@ def resumo_mes(user_id: int, ano: int, mes: int):
     - investimentos = apenas categoria "Investimentos"
     - gastos_totais = soma de TODOS os gastos do mês (inclui investimentos)
     """
-    prefixo = f"{ano:04d}-{mes:02d}"
+    return resumo_meses(user_id, (ano, mes), (ano, mes))[(ano, mes)]
 
-    conn = _conectar()
-    cur = conn.cursor()
 
-    # entradas
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM transacoes
-        WHERE user_id = ?
-          AND tipo='entrada'
-          AND substr(criado_em,1,7)=?
-        """,
-        (user_id, prefixo),
-    )
-    entradas = float(cur.fetchone()["total"] or 0)
+def top_categorias_mes(user_id: int, ano: int, mes: int, limite: int = 5):
+    """
+    Principais gastos (SEM Investimentos, pra não poluir o top)
+    """
+    return top_categorias_meses(user_id, (ano, mes), (ano, mes), limite=limite)[(ano, mes)]
 
-    # gastos totais (inclui investimentos)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM transacoes
-        WHERE user_id = ?
-          AND tipo='gasto'
-          AND substr(criado_em,1,7)=?
-        """,
-        (user_id, prefixo),
+
+def top_categorias_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int], limite: int = 5):
+    """
+    Top categorias de cada mês do intervalo numa consulta só (ROW_NUMBER por mês).
+    Retorna: {(ano, mes): [(categoria, total), ...]} (meses sem gasto ficam com lista vazia)
+    """
+    tops = _com_cache(
+        user_id,
+        list(_meses_entre(inicio, fim)),
+        ("top", limite),
+        lambda ini, fim_: _consultar_top_categorias_meses(user_id, ini, fim_, limite),
     )
-    gastos_totais = float(cur.fetchone()["total"] or 0)
+    return {am: list(top) for am, top in tops.items()}
 
-    # investimentos (subset)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM transacoes
-        WHERE user_id = ?
-          AND tipo='gasto'
-          AND substr(criado_em,1,7)=?
-          AND categoria='Investimentos'
-        """,
-        (user_id, prefixo),
+
+def _consultar_top_categorias_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int], limite: int):
+    with _leitura() as conn:
+        rows = conn.execute(
+            """
+            SELECT mes, categoria, total_centavos
+            FROM (
+                SELECT mes, categoria, total_centavos,
+                       ROW_NUMBER() OVER (PARTITION BY mes ORDER BY total_centavos DESC) as pos
+                FROM resumo_mensal
+                WHERE user_id = ?
+                  AND mes BETWEEN ? AND ?
+                  AND tipo='gasto'
+                  AND categoria != 'Investimentos'
+            )
+            WHERE pos <= ?
+            ORDER BY mes, pos
+            """,
+            (user_id, _prefixo(*inicio), _prefixo(*fim), limite),
+        ).fetchall()
+
+    resultado = {am: [] for am in _meses_entre(inicio, fim)}
+    for r in rows:
+        ano, mes = int(r["mes"][:4]), int(r["mes"][5:7])
+        resultado[(ano, mes)].append((r["categoria"], r["total_centavos"] / 100.0))
+    return {am: tuple(top) for am, top in resultado.items()}  # imutável: vai pro cache
+
+
+def gasto_diario_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int]):
+    """
+    Série diária acumulada de gasto por categoria (SEM Investimentos), base da previsão do mês.
+    Retorna: {(ano, mes): ((categoria, dia, acumulado_centavos), ...)} só com os dias que tiveram gasto
+    (meses fechados saem do cache; só o mês atual volta pro banco depois de um gasto novo).
+    """
+    return _com_cache(
+        user_id,
+        list(_meses_entre(inicio, fim)),
+        "diario",
+        lambda ini, fim_: _consultar_gasto_diario_meses(user_id, ini, fim_),
     )
-    investimentos = float(cur.fetchone()["total"] or 0)
 
-    conn.close()
-    return entradas, gastos_totais, investimentos
 
+def _consultar_gasto_diario_meses(user_id: int, inicio: tuple[int, int], fim: tuple[int, int]):
+    with _leitura() as conn:
+        rows = conn.execute(
+            """
+            SELECT mes, categoria, dia,
+                   SUM(total_dia) OVER (PARTITION BY mes, categoria ORDER BY dia) as acumulado
+            FROM (
+                SELECT mes, categoria,
+                       CAST(substr(criado_em, 9, 2) AS INTEGER) as dia,
+                       SUM(CAST(ROUND(valor * 100) AS INTEGER)) as total_dia
+                FROM transacoes
+                WHERE user_id = ?
+                  AND tipo='gasto'
+                  AND mes BETWEEN ? AND ?
+                  AND categoria != 'Investimentos'
+                GROUP BY mes, categoria, dia
+            )
+            """,
+            (user_id, _prefixo(*inicio), _prefixo(*fim)),
+        ).fetchall()
 
-def top_categorias_mes(user_id: int, ano: int, mes: int, limite: int = 5):
+    resultado = {am: [] for am in _meses_entre(inicio, fim)}
+    for r in rows:
+        ano, mes = int(r["mes"][:4]), int(r["mes"][5:7])
+        resultado[(ano, mes)].append((r["categoria"], r["dia"], r["acumulado"]))
+    return {am: tuple(serie) for am, serie in resultado.items()}  # imutável: vai pro cache
+
+
+def relatorios_mes_lote(ano: int, mes: int, apos_user_id: int = 0, limite: int = 500, limite_top: int = 5):
     """
-    Principais gastos (SEM Investimentos, pra não poluir o top)
+    Dados do relatório mensal de um lote de usuários (keyset por user_id).
+    Quem já tem relatório renderizado na versão atual vem só com o texto;
+    o resto vem com totais do mês + top categorias (ROW_NUMBER por usuário).
+    Inclui usuários sem lançamento no mês (totais zerados).
+    Retorna: [{user_id, versao, texto, entradas, gastos_totais, investimentos, tops}, ...]
+    ordenado por user_id (texto=None -> precisa renderizar; totais=None -> já tem texto)
     """
-    prefixo = f"{ano:04d}-{mes:02d}"
+    prefixo = _prefixo(ano, mes)
 
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT categoria, COALESCE(SUM(valor), 0) as total
-        FROM transacoes
-        WHERE user_id = ?
-          AND tipo='gasto'
-          AND substr(criado_em,1,7)=?
-          AND categoria != 'Investimentos'
-        GROUP BY categoria
-        ORDER BY total DESC
-        LIMIT ?
-        """,
-        (user_id, prefixo, limite),
-    )
-    rows = cur.fetchall()
-    conn.close()
+    with _leitura() as conn:
+        usuarios = conn.execute(
+            """
+            SELECT s.user_id, COALESCE(v.versao, 0) as versao, rr.texto
+            FROM saldos s
+            LEFT JOIN versoes_mes v ON v.user_id=s.user_id AND v.mes=?
+            LEFT JOIN relatorios_renderizados rr
+                   ON rr.user_id=s.user_id AND rr.mes=? AND rr.versao=COALESCE(v.versao, 0)
+            WHERE s.user_id > ?
+            ORDER BY s.user_id
+            LIMIT ?
+            """,
+            (prefixo, prefixo, apos_user_id, limite),
+        ).fetchall()
 
-    return [(r["categoria"], float(r["total"] or 0)) for r in rows]
+        if not usuarios:
+            return []
 
+        ids = [r["user_id"] for r in usuarios if r["texto"] is None]
+        marcadores = ",".join("?" * len(ids))
+        rows = conn.execute(
+            f"""
+            SELECT user_id,
+                   COALESCE(SUM(CASE WHEN tipo='entrada' THEN total_centavos END), 0) as entradas,
+                   COALESCE(SUM(CASE WHEN tipo='gasto' THEN total_centavos END), 0) as gastos,
+                   COALESCE(SUM(CASE WHEN tipo='gasto' AND categoria='Investimentos' THEN total_centavos END), 0) as investimentos
+            FROM resumo_mensal
+            WHERE user_id IN ({marcadores})
+              AND mes=?
+            GROUP BY user_id
+            """,
+            (*ids, prefixo),
+        ).fetchall() if ids else []
 
-def saldo_acumulado(user_id: int) -> float:
-    conn = _conectar()
-    cur = conn.cursor()
+        tops_rows = conn.execute(
+            f"""
+            SELECT user_id, categoria, total_centavos
+            FROM (
+                SELECT user_id, categoria, total_centavos,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY total_centavos DESC) as pos
+                FROM resumo_mensal
+                WHERE user_id IN ({marcadores})
+                  AND mes=?
+                  AND tipo='gasto'
+                  AND categoria != 'Investimentos'
+            )
+            WHERE pos <= ?
+            ORDER BY user_id, pos
+            """,
+            (*ids, prefixo, limite_top),
+        ).fetchall() if ids else []
 
-    cur.execute(
-        "SELECT COALESCE(SUM(valor),0) as t FROM transacoes WHERE user_id=? AND tipo='entrada'",
-        (user_id,),
-    )
-    entradas = float(cur.fetchone()["t"] or 0)
+    totais = {r["user_id"]: r for r in rows}
+    tops = {}
+    for r in tops_rows:
+        tops.setdefault(r["user_id"], []).append((r["categoria"], r["total_centavos"] / 100.0))
+
+    resultado = []
+    for u in usuarios:
+        item = {
+            "user_id": int(u["user_id"]),
+            "versao": u["versao"],
+            "texto": u["texto"],
+            "entradas": None,
+            "gastos_totais": None,
+            "investimentos": None,
+            "tops": None,
+        }
+        if u["texto"] is None:
+            t = totais.get(u["user_id"])
+            item["entradas"] = t["entradas"] / 100.0 if t else 0.0
+            item["gastos_totais"] = t["gastos"] / 100.0 if t else 0.0
+            item["investimentos"] = t["investimentos"] / 100.0 if t else 0.0
+            item["tops"] = tops.get(u["user_id"], [])
+        resultado.append(item)
+    return resultado
+
+
+def relatorio_renderizado(user_id: int, ano: int, mes: int):
+    """
+    Retorna: (versao_atual, texto) -> texto=None se não há relatório salvo nessa versão.
+    Leia ANTES de montar o relatório e salve com essa versão: se entrar um lançamento
+    no meio, a versão salva já nasce velha e é ignorada.
+    """
+    prefixo = _prefixo(ano, mes)
+    with _leitura() as conn:
+        row = conn.execute(
+            """
+            SELECT COALESCE(v.versao, 0) as versao, rr.texto
+            FROM (SELECT 1)
+            LEFT JOIN versoes_mes v ON v.user_id=? AND v.mes=?
+            LEFT JOIN relatorios_renderizados rr
+                   ON rr.user_id=? AND rr.mes=? AND rr.versao=COALESCE(v.versao, 0)
+            """,
+            (user_id, prefixo, user_id, prefixo),
+        ).fetchone()
+    return row["versao"], row["texto"]
 
-    cur.execute(
-        "SELECT COALESCE(SUM(valor),0) as t FROM transacoes WHERE user_id=? AND tipo='gasto'",
-        (user_id,),
-    )
-    gastos = float(cur.fetchone()["t"] or 0)
 
-    conn.close()
-    return entradas - gastos
+def salvar_relatorios_renderizados(ano: int, mes: int, linhas):
+    """
+    linhas = [(user_id, versao, texto), ...] -> um commit só.
+    Nunca troca um relatório por outro de versão mais antiga.
+    """
+    prefixo = _prefixo(ano, mes)
+    params = [(user_id, prefixo, versao, texto) for user_id, versao, texto in linhas]
+    if not params:
+        return
+
+    with _escrita() as conn:
+        conn.executemany(
+            """
+            INSERT INTO relatorios_renderizados (user_id, mes, versao, texto)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, mes) DO UPDATE SET
+                versao = excluded.versao,
+                texto = excluded.texto
+            WHERE excluded.versao >= relatorios_renderizados.versao
+            """,
+            params,
+        )
+
+
+def saldo_acumulado(user_id: int) -> float:
+    # ✅ 1 lookup pela PK (a tabela saldos é mantida pelos triggers)
+    with _leitura() as conn:
+        row = conn.execute(
+            "SELECT saldo_centavos FROM saldos WHERE user_id=?",
+            (user_id,),
+        ).fetchone()
+    return row["saldo_centavos"] / 100.0 if row else 0.0
 
 
 def alerta_ja_enviado(user_id: int, alerta: str, periodo: str) -> bool:
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT 1 FROM alertas_enviados WHERE user_id=? AND alerta=? AND periodo=? LIMIT 1",
-        (user_id, alerta, periodo),
-    )
-    ok = cur.fetchone() is not None
-    conn.close()
-    return ok
+    with _leitura() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM alertas_enviados WHERE user_id=? AND alerta=? AND periodo=? LIMIT 1",
+            (user_id, alerta, periodo),
+        ).fetchone()
+    return row is not None
 
 
-def marcar_alerta_enviado(user_id: int, alerta: str, periodo: str):
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT OR IGNORE INTO alertas_enviados (user_id, alerta, periodo, enviado_em)
-        VALUES (?, ?, ?, ?)
-        """,
-        (user_id, alerta, periodo, datetime.now(TZ).isoformat()),
-    )
-    conn.commit()
-    conn.close()
+def marcar_alerta_enviado(user_id: int, alerta: str, periodo: str) -> bool:
+    """
+    Retorna True se marcou agora (False = já tinha sido enviado no período).
+    Serve de "checa e marca" numa ida só, graças ao UNIQUE(user_id, alerta, periodo).
+    """
+    with _escrita() as conn:
+        cur = conn.execute(
+            """
+            INSERT OR IGNORE INTO alertas_enviados (user_id, alerta, periodo, enviado_em)
+            VALUES (?, ?, ?, ?)
+            """,
+            (user_id, alerta, periodo, datetime.now(TZ).isoformat()),
+        )
+        return cur.rowcount > 0
+
+
+def marcar_alertas_enviados(alertas):
+    """
+    Marca vários alertas de uma vez (1 commit).
+    alertas = [(user_id, alerta, periodo), ...]
+    """
+    agora = datetime.now(TZ).isoformat()
+    with _escrita() as conn:
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO alertas_enviados (user_id, alerta, periodo, enviado_em)
+            VALUES (?, ?, ?, ?)
+            """,
+            [(user_id, alerta, periodo, agora) for user_id, alerta, periodo in alertas],
+        )
+
+
+def alertas_diarios_pendentes(
+    periodo: str,
+    saldo_negativo: bool = True,
+    limite_gastos_centavos: int | None = None,
+    user_id: int | None = None,
+):
+    """
+    Avalia os alertas diários de TODOS os usuários em conjunto (ou de um só, se user_id).
+    periodo = "AAAA-MM" (também é o mês dos gastos).
+    Já descarta o que foi enviado no período.
+    Retorna: [(user_id, alerta, valor_centavos), ...]
+      - "saldo_negativo": valor = saldo acumulado
+      - "limite_gastos": valor = gastos do mês (inclui investimentos)
+    """
+    partes = []
+    params = []
+
+    filtro_user = ""
+    if user_id is not None:
+        filtro_user = "AND x.user_id = ?"
+
+    if saldo_negativo:
+        partes.append(
+            f"""
+            SELECT x.user_id, 'saldo_negativo' as alerta, x.saldo_centavos as valor_centavos
+            FROM saldos x
+            WHERE x.saldo_centavos < 0
+              {filtro_user}
+              AND NOT EXISTS (
+                  SELECT 1 FROM alertas_enviados a
+                  WHERE a.user_id=x.user_id AND a.alerta='saldo_negativo' AND a.periodo=?
+              )
+            """
+        )
+        params += ([user_id] if user_id is not None else []) + [periodo]
+
+    if limite_gastos_centavos is not None:
+        partes.append(
+            f"""
+            SELECT x.user_id, 'limite_gastos' as alerta, x.gastos as valor_centavos
+            FROM (
+                SELECT user_id, SUM(total_centavos) as gastos
+                FROM resumo_mensal
+                WHERE mes=? AND tipo='gasto'
+                GROUP BY user_id
+            ) x
+            WHERE x.gastos >= ?
+              {filtro_user}
+              AND NOT EXISTS (
+                  SELECT 1 FROM alertas_enviados a
+                  WHERE a.user_id=x.user_id AND a.alerta='limite_gastos' AND a.periodo=?
+              )
+            """
+        )
+        params += [periodo, limite_gastos_centavos] + ([user_id] if user_id is not None else []) + [periodo]
+
+    if not partes:
+        return []
+
+    with _leitura() as conn:
+        rows = conn.execute(" UNION ALL ".join(partes), params).fetchall()
+    return [(int(r["user_id"]), r["alerta"], int(r["valor_centavos"])) for r in rows]
 
 
 def total_gasto_categoria_mes(user_id: int, categoria: str, ano: int, mes: int) -> float:
-    prefixo = f"{ano:04d}-{mes:02d}"
+    achou, valor = _cache.obter(user_id, _prefixo(ano, mes), ("cat", categoria))
+    if achou:
+        return valor
 
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM transacoes
-        WHERE user_id = ?
-          AND tipo='gasto'
-          AND categoria=?
-          AND substr(criado_em,1,7)=?
-        """,
-        (user_id, categoria, prefixo),
-    )
-    total = float(cur.fetchone()["total"] or 0)
-    conn.close()
+    total = _consultar_total_gasto_categoria_mes(user_id, categoria, ano, mes)
+    _cache.guardar(user_id, _prefixo(ano, mes), ("cat", categoria), total, valor)
     return total
 
 
+def _consultar_total_gasto_categoria_mes(user_id: int, categoria: str, ano: int, mes: int) -> float:
+    with _leitura() as conn:
+        row = conn.execute(
+            """
+            SELECT total_centavos
+            FROM resumo_mensal
+            WHERE user_id = ?
+              AND mes=?
+              AND tipo='gasto'
+              AND categoria=?
+            """,
+            (user_id, _prefixo(ano, mes), categoria),
+        ).fetchone()
+    return row["total_centavos"] / 100.0 if row else 0.0
+
+
 # compat
 def buscar_resumo_mensal(user_id: int, ano: int, mes: int):
     return resumo_mes(user_id, ano, mes)
 
 
 def buscar_transacoes_mensal(user_id: int, ano: int, mes: int):
-    prefixo = f"{ano:04d}-{mes:02d}"
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, tipo, valor, categoria, descricao, criado_em
-        FROM transacoes
-        WHERE user_id=? AND substr(criado_em,1,7)=?
-        ORDER BY criado_em DESC
-        """,
-        (user_id, prefixo),
-    )
-    rows = cur.fetchall()
-    conn.close()
+    # range no criado_em: usa o índice (user_id, criado_em) pro filtro e pra ordem
+    with _leitura() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, tipo, valor, categoria, descricao, criado_em
+            FROM transacoes
+            WHERE user_id=? AND criado_em >= ? AND criado_em < ?
+            ORDER BY criado_em DESC
+            """,
+            (user_id, _prefixo(ano, mes), _prefixo_seguinte(ano, mes)),
+        ).fetchall()
     return [dict(r) for r in rows]
 
+
+COLUNAS_EXPORTACAO = ("id", "criado_em", "tipo", "categoria", "descricao", "valor")
+
+
+def iterar_transacoes(user_id: int, inicio: str | None = None, fim: str | None = None, tamanho: int = 1000):
+    """
+    Gera blocos de transações (listas de tuplas) em ordem cronológica, via fetchmany.
+    inicio/fim = prefixos de criado_em (fim exclusivo; None = sem limite).
+    Usa uma conexão própria, fora do pool e da escrita: exportação longa não
+    segura leitor de ninguém nem o lock de escrita. Colunas em COLUNAS_EXPORTACAO.
+    """
+    filtros = ["user_id=?"]
+    params = [user_id]
+    if inicio:
+        filtros.append("criado_em >= ?")
+        params.append(inicio)
+    if fim:
+        filtros.append("criado_em < ?")
+        params.append(fim)
+
+    conn = _abrir_conexao()
+    try:
+        cur = conn.execute(
+            f"""
+            SELECT {", ".join(COLUNAS_EXPORTACAO)}
+            FROM transacoes
+            WHERE {" AND ".join(filtros)}
+            ORDER BY criado_em, id
+            """,
+            params,
+        )
+        while True:
+            bloco = cur.fetchmany(tamanho)
+            if not bloco:
+                return
+            yield [tuple(r) for r in bloco]
+    finally:
+        conn.close()
+
+
+def _consulta_fts(termo: str) -> str | None:
+    """
+    "ifood pizza" -> '"ifood"* AND "pizza"*' (cada palavra vira prefixo; aspas
+    neutralizam a sintaxe do FTS digitada pelo usuário). None se não sobrar palavra.
+    """
+    palavras = [p.replace('"', "") for p in termo.split()]
+    palavras = [p for p in palavras if p]
+    if not palavras:
+        return None
+    return " AND ".join(f'"{p}"*' for p in palavras)
+
+
+def buscar_transacoes(user_id: int, termo: str, inicio: str | None = None, fim: str | None = None,
+                      limite: int = 10, antes=None):
+    """
+    Busca na descrição/categoria pelo índice FTS5, do mais novo pro mais antigo.
+    inicio/fim = prefixos de criado_em (fim exclusivo; None = sem limite).
+    antes=(criado_em, id): keyset da próxima página (só na lista; os totais são do período todo).
+    Retorna: {"itens": [...], "tem_mais": bool, "qtd": int, "entradas": float, "gastos": float}
+    """
+    consulta = _consulta_fts(termo)
+    vazio = {"itens": [], "tem_mais": False, "qtd": 0, "entradas": 0.0, "gastos": 0.0}
+    if consulta is None:
+        return vazio
+
+    filtros = ["transacoes_fts MATCH ?", "t.user_id=?"]
+    # os termos do usuário só valem nas colunas de texto (senão "u1" casaria o token do dono)
+    params = [f"dono : u{user_id} AND {{descricao categoria}} : ({consulta})", user_id]
+    if inicio:
+        filtros.append("t.criado_em >= ?")
+        params.append(inicio)
+    if fim:
+        filtros.append("t.criado_em < ?")
+        params.append(fim)
+    where = " AND ".join(filtros)
+
+    pagina_filtros = where
+    pagina_params = list(params)
+    if antes is not None:
+        pagina_filtros += " AND (t.criado_em, t.id) < (?, ?)"
+        pagina_params += [antes[0], antes[1]]
+
+    with _leitura() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT t.id, t.tipo, t.valor, t.categoria, t.descricao, t.criado_em
+            FROM transacoes_fts
+            -- CROSS JOIN: força o FTS como tabela externa (o inverso roda o MATCH uma vez por linha)
+            CROSS JOIN transacoes t ON t.id = transacoes_fts.rowid
+            WHERE {pagina_filtros}
+            ORDER BY t.criado_em DESC, t.id DESC
+            LIMIT ?
+            """,
+            (*pagina_params, limite + 1),
+        ).fetchall()
+
+        totais = conn.execute(
+            f"""
+            SELECT COUNT(*) as qtd,
+                   COALESCE(SUM(CASE WHEN t.tipo='entrada' THEN CAST(ROUND(t.valor * 100) AS INTEGER) END), 0) as entradas,
+                   COALESCE(SUM(CASE WHEN t.tipo='gasto' THEN CAST(ROUND(t.valor * 100) AS INTEGER) END), 0) as gastos
+            FROM transacoes_fts
+            CROSS JOIN transacoes t ON t.id = transacoes_fts.rowid
+            WHERE {where}
+            """,
+            params,
+        ).fetchone()
+
+    return {
+        "itens": [dict(r) for r in rows[:limite]],
+        "tem_mais": len(rows) > limite,
+        "qtd": totais["qtd"],
+        "entradas": totais["entradas"] / 100.0,
+        "gastos": totais["gastos"] / 100.0,
+    }
+
+
 def ultimas_transacoes(user_id: int, limite: int = 10):
-    conn = _conectar()
-    cur = conn.cursor()
-    cur.execute(
+    itens, _ = pagina_transacoes(user_id, limite=limite)
+    return itens
+
+
+def pagina_transacoes(user_id: int, limite: int = 10, antes=None, depois=None):
+    """
+    Página do extrato por keyset em (criado_em, id), do mais novo pro mais antigo.
+    - antes=(criado_em, id): itens mais antigos que o cursor (próxima página)
+    - depois=(criado_em, id): itens mais novos que o cursor (página anterior)
+    Cada página é um seek no índice (user_id, criado_em), não importa a profundidade.
+    Retorna: (itens, tem_mais) -> tem_mais = ainda há itens na direção pedida
+    """
+    campos = "SELECT id, tipo, valor, categoria, descricao, criado_em FROM transacoes"
+
+    if depois is not None:
+        sql = f"""
+            {campos}
+            WHERE user_id=? AND (criado_em, id) > (?, ?)
+            ORDER BY criado_em ASC, id ASC
+            LIMIT ?
         """
-        SELECT id, tipo, valor, categoria, descricao, criado_em
-        FROM transacoes
-        WHERE user_id=?
-        ORDER BY datetime(criado_em) DESC
-        LIMIT ?
-        """,
-        (user_id, limite),
+        params = (user_id, depois[0], depois[1], limite + 1)
+    elif antes is not None:
+        sql = f"""
+            {campos}
+            WHERE user_id=? AND (criado_em, id) < (?, ?)
+            ORDER BY criado_em DESC, id DESC
+            LIMIT ?
+        """
+        params = (user_id, antes[0], antes[1], limite + 1)
+    else:
+        sql = f"""
+            {campos}
+            WHERE user_id=?
+            ORDER BY criado_em DESC, id DESC
+            LIMIT ?
+        """
+        params = (user_id, limite + 1)
+
+    with _leitura() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    itens = [dict(r) for r in rows[:limite]]
+    if depois is not None:
+        itens.reverse()
+    return itens, len(rows) > limite
+
+
+def apagar_transacao(user_id: int, transacao_id: int) -> int:
+    """
+    Apaga somente se a transação for do próprio user_id.
+    Se for parcela, apaga a compra inteira: as já lançadas (mesmo grupo_id)
+    e as que ainda não venceram (parcelas_futuras), sob o mesmo lock de escrita.
+    Retorna quantas parcelas/lançamentos apagou (0 = não encontrou).
+    """
+    with _escrita() as conn:
+        alvo = conn.execute(
+            "SELECT grupo_id FROM transacoes WHERE id=? AND user_id=?",
+            (transacao_id, user_id),
+        ).fetchone()
+        if alvo is None:
+            return 0
+
+        # meses lidos ANTES do DELETE (sem RETURNING: roda no SQLite 3.34 do Debian 11)
+        if alvo["grupo_id"] is None:
+            filtro, chave = "id=?", transacao_id
+        else:
+            filtro, chave = "grupo_id=?", alvo["grupo_id"]
+        meses = {
+            r["mes"]
+            for r in conn.execute(f"SELECT DISTINCT mes FROM transacoes WHERE user_id=? AND {filtro}", (user_id, chave))
+        }
+
+        apagados = conn.execute(f"DELETE FROM transacoes WHERE user_id=? AND {filtro}", (user_id, chave)).rowcount
+        if alvo["grupo_id"] is not None:
+            apagados += conn.execute(
+                "DELETE FROM parcelas_futuras WHERE user_id=? AND grupo_id=?",
+                (user_id, alvo["grupo_id"]),
+            ).rowcount
+
+    _invalidar_cache({(user_id, mes) for mes in meses})
+    return apagados
+
+
+def buscar_transacao(user_id: int, transacao_id: int):
+    with _leitura() as conn:
+        row = conn.execute(
+            "SELECT id, tipo, valor, categoria, descricao, criado_em FROM transacoes WHERE id=? AND user_id=?",
+            (transacao_id, user_id),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def recategorizar_transacao(user_id: int, transacao_id: int, categoria: str):
+    """
+    Troca a categoria de uma transação do próprio user_id (os triggers ajustam o resumo_mensal).
+    Retorna True se alterou, False se não encontrou.
+    """
+    with _escrita() as conn:
+        row = conn.execute(
+            "SELECT mes FROM transacoes WHERE id=? AND user_id=?",
+            (transacao_id, user_id),
+        ).fetchone()
+        if row is None:
+            return False
+        conn.execute(
+            "UPDATE transacoes SET categoria=? WHERE id=? AND user_id=?",
+            (categoria, transacao_id, user_id),
+        )
+
+    _invalidar_cache({(user_id, row["mes"])})
+    return True
+
+
+def categorias_aprendidas(user_id: int) -> dict:
+    """
+    Retorna: {(tipo, termo): categoria} do usuário
+    """
+    with _leitura() as conn:
+        rows = conn.execute(
+            "SELECT tipo, termo, categoria FROM categorias_usuario WHERE user_id=?",
+            (user_id,),
+        ).fetchall()
+    return {(r["tipo"], r["termo"]): r["categoria"] for r in rows}
+
+
+def salvar_categoria_aprendida(user_id: int, tipo: str, termo: str, categoria: str):
+    with _escrita() as conn:
+        conn.execute(
+            """
+            INSERT INTO categorias_usuario (user_id, tipo, termo, categoria, atualizado_em)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, tipo, termo) DO UPDATE SET
+                categoria = excluded.categoria,
+                atualizado_em = excluded.atualizado_em
+            """,
+            (user_id, tipo, termo, categoria, datetime.now(TZ).isoformat()),
+        )
+
+
+# =========================
+# RECORRÊNCIAS
+# =========================
+def criar_recorrencia(user_id: int, tipo: str, valor_centavos: int, categoria: str, descricao: str,
+                      cadencia: str, dia: int, proxima: str) -> int:
+    """
+    proxima = "AAAA-MM-DD" da 1ª execução. Retorna o id da recorrência.
+    """
+    with _escrita() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO recorrencias
+                (user_id, tipo, valor_centavos, categoria, descricao, cadencia, dia, proxima_execucao, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, tipo, valor_centavos, categoria, descricao, cadencia, dia, proxima, datetime.now(TZ).isoformat()),
+        )
+        return cur.lastrowid
+
+
+def listar_recorrencias(user_id: int):
+    with _leitura() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, tipo, valor_centavos, categoria, descricao, cadencia, dia, proxima_execucao
+            FROM recorrencias
+            WHERE user_id=?
+            ORDER BY proxima_execucao, id
+            """,
+            (user_id,),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def apagar_recorrencia(user_id: int, recorrencia_id: int) -> bool:
+    with _escrita() as conn:
+        cur = conn.execute(
+            "DELETE FROM recorrencias WHERE id=? AND user_id=?",
+            (recorrencia_id, user_id),
+        )
+        return cur.rowcount > 0
+
+
+def lancar_recorrencias_vencidas(hoje: str, limite: int = 500) -> list[dict]:
+    """
+    Lança um lote de recorrências vencidas (proxima_execucao <= hoje) numa transação só:
+    insere as transações (criado_em = dia do vencimento) e avança proxima_execucao.
+    Quem estava atrasado mais de um ciclo continua vencido e sai no próximo lote.
+    Retorna: [{user_id, recorrencia_id, transacao_id, tipo, valor_centavos, categoria, descricao, data}, ...]
+    (lista vazia = nada mais vencido)
+    """
+    with _escrita() as conn:
+        vencidas = conn.execute(
+            """
+            SELECT id, user_id, tipo, valor_centavos, categoria, descricao, cadencia, dia, proxima_execucao
+            FROM recorrencias
+            WHERE proxima_execucao <= ?
+            ORDER BY proxima_execucao
+            LIMIT ?
+            """,
+            (hoje, limite),
+        ).fetchall()
+        if not vencidas:
+            return []
+
+        params = []
+        avancos = []
+        for r in vencidas:
+            vencimento = datetime.fromisoformat(r["proxima_execucao"])
+            criado_em = vencimento.replace(hour=8, tzinfo=TZ).isoformat()
+            params.append((r["user_id"], r["tipo"], r["valor_centavos"] / 100.0, r["categoria"], r["descricao"], criado_em))
+
+            proxima = proxima_execucao(vencimento.date(), r["cadencia"], r["dia"])
+            avancos.append((proxima.isoformat(), r["id"]))
+
+        conn.executemany(
+            """
+            INSERT INTO transacoes (user_id, tipo, valor, categoria, descricao, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            params,
+        )
+        # escritor único + AUTOINCREMENT: os ids do lote são consecutivos
+        ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.executemany("UPDATE recorrencias SET proxima_execucao=? WHERE id=?", avancos)
+
+    _invalidar_cache({(p[0], p[5][:7]) for p in params})
+
+    primeiro = ultimo - len(params) + 1
+    return [
+        {
+            "user_id": r["user_id"],
+            "recorrencia_id": r["id"],
+            "transacao_id": primeiro + i,
+            "tipo": r["tipo"],
+            "valor_centavos": r["valor_centavos"],
+            "categoria": r["categoria"],
+            "descricao": r["descricao"],
+            "data": r["proxima_execucao"],
+        }
+        for i, r in enumerate(vencidas)
+    ]
+
+
+# =========================
+# MANUTENÇÃO DO AGREGADO
+# =========================
+def _reconstruir_resumo_mensal(cur):
+    cur.execute("DELETE FROM resumo_mensal")
+    cur.execute(
+        "INSERT INTO resumo_mensal (user_id, mes, tipo, categoria, total_centavos, qtd) "
+        + _SQL_RESUMO_ESPERADO
     )
-    rows = cur.fetchall()
-    conn.close()
+
+
+def reconstruir_resumo_mensal() -> int:
+    """
+    Recalcula resumo_mensal do zero a partir de transacoes.
+    Retorna quantas linhas o agregado ficou.
+    """
+    with _escrita() as conn:
+        cur = conn.cursor()
+        _reconstruir_resumo_mensal(cur)
+        total = cur.execute("SELECT COUNT(*) FROM resumo_mensal").fetchone()[0]
+
+    _cache.limpar()
+    return total
+
+
+def verificar_resumo_mensal():
+    """
+    Compara o agregado com o recálculo a partir de transacoes.
+    Retorna a lista de divergências (vazia = tudo certo):
+    [{user_id, mes, tipo, categoria, esperado_centavos, gravado_centavos}, ...]
+    """
+    with _leitura() as conn:
+        rows = conn.execute(
+            f"""
+            WITH esperado AS ({_SQL_RESUMO_ESPERADO}),
+            chaves AS (
+                SELECT user_id, mes, tipo, categoria FROM esperado
+                UNION
+                SELECT user_id, mes, tipo, categoria FROM resumo_mensal
+            )
+            SELECT k.user_id, k.mes, k.tipo, k.categoria,
+                   COALESCE(e.total_centavos, 0) as esperado_centavos,
+                   COALESCE(r.total_centavos, 0) as gravado_centavos,
+                   COALESCE(e.qtd, 0) as esperado_qtd,
+                   COALESCE(r.qtd, 0) as gravado_qtd
+            FROM chaves k
+            LEFT JOIN esperado e
+              ON e.user_id=k.user_id AND e.mes=k.mes AND e.tipo=k.tipo AND e.categoria=k.categoria
+            LEFT JOIN resumo_mensal r
+              ON r.user_id=k.user_id AND r.mes=k.mes AND r.tipo=k.tipo AND r.categoria=k.categoria
+            WHERE COALESCE(e.total_centavos, 0) != COALESCE(r.total_centavos, 0)
+               OR COALESCE(e.qtd, 0) != COALESCE(r.qtd, 0)
+            ORDER BY k.user_id, k.mes
+            """
+        ).fetchall()
     return [dict(r) for r in rows]
 
 
-def apagar_transacao(user_id: int, transacao_id: int) -> bool:
+def _reconstruir_saldos(cur):
+    cur.execute("DELETE FROM saldos")
+    cur.execute("INSERT INTO saldos (user_id, saldo_centavos) " + _SQL_SALDO_ESPERADO)
+
+
+def reconstruir_saldos() -> int:
     """
-    Apaga somente se a transação for do próprio user_id.
-    Retorna True se apagou, False se não encontrou.
+    Recalcula a tabela saldos a partir de transacoes. Retorna quantos usuários.
+    """
+    with _escrita() as conn:
+        cur = conn.cursor()
+        _reconstruir_saldos(cur)
+        return cur.execute("SELECT COUNT(*) FROM saldos").fetchone()[0]
+
+
+def verificar_saldos():
+    """
+    Modo de conferência: recalcula o saldo de cada usuário a partir de
+    transacoes e devolve as divergências com a tabela saldos.
+    [{user_id, esperado_centavos, gravado_centavos}, ...]
     """
-    conn = _conectar()
-    cur = conn.cursor()
+    with _leitura() as conn:
+        rows = conn.execute(
+            f"""
+            WITH esperado AS ({_SQL_SALDO_ESPERADO}),
+            chaves AS (
+                SELECT user_id FROM esperado
+                UNION
+                SELECT user_id FROM saldos
+            )
+            SELECT k.user_id,
+                   COALESCE(e.saldo_centavos, 0) as esperado_centavos,
+                   COALESCE(s.saldo_centavos, 0) as gravado_centavos
+            FROM chaves k
+            LEFT JOIN esperado e ON e.user_id=k.user_id
+            LEFT JOIN saldos s ON s.user_id=k.user_id
+            WHERE COALESCE(e.saldo_centavos, 0) != COALESCE(s.saldo_centavos, 0)
+            ORDER BY k.user_id
+            """
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+# Welford em REAL: tolerância pra arredondamento (centavos na média, relativa no M2)
+TOLERANCIA_MEDIA = 0.01
+TOLERANCIA_M2_RELATIVA = 1e-6
 
+
+def _reconstruir_estatisticas_categoria(cur):
+    cur.execute("DELETE FROM estatisticas_categoria")
     cur.execute(
-        "DELETE FROM transacoes WHERE id=? AND user_id=?",
-        (transacao_id, user_id),
+        "INSERT INTO estatisticas_categoria (user_id, categoria, n, media, m2) "
+        + _SQL_ESTATISTICA_ESPERADA
     )
-    apagou = cur.rowcount > 0
 
-    conn.commit()
-    conn.close()
-    return apagou
 
+def reconstruir_estatisticas_categoria() -> int:
+    """
+    Recalcula estatisticas_categoria a partir de transacoes. Retorna quantas (user, categoria).
+    """
+    with _escrita() as conn:
+        cur = conn.cursor()
+        _reconstruir_estatisticas_categoria(cur)
+        return cur.execute("SELECT COUNT(*) FROM estatisticas_categoria").fetchone()[0]
+
+
+def verificar_estatisticas_categoria():
+    """
+    Modo de conferência: recalcula n/média/M2 de cada (user, categoria) a partir de
+    transacoes e devolve as divergências (com tolerância, são REAL) com a tabela.
+    [{user_id, categoria, esperado_n, gravado_n, esperado_media, gravado_media, esperado_m2, gravado_m2}, ...]
+    """
+    with _leitura() as conn:
+        rows = conn.execute(
+            f"""
+            WITH esperado AS ({_SQL_ESTATISTICA_ESPERADA}),
+            chaves AS (
+                SELECT user_id, categoria FROM esperado
+                UNION
+                SELECT user_id, categoria FROM estatisticas_categoria
+            )
+            SELECT k.user_id, k.categoria,
+                   COALESCE(e.n, 0) as esperado_n, COALESCE(g.n, 0) as gravado_n,
+                   COALESCE(e.media, 0) as esperado_media, COALESCE(g.media, 0) as gravado_media,
+                   COALESCE(e.m2, 0) as esperado_m2, COALESCE(g.m2, 0) as gravado_m2
+            FROM chaves k
+            LEFT JOIN esperado e ON e.user_id=k.user_id AND e.categoria=k.categoria
+            LEFT JOIN estatisticas_categoria g ON g.user_id=k.user_id AND g.categoria=k.categoria
+            WHERE COALESCE(e.n, 0) != COALESCE(g.n, 0)
+               OR ABS(COALESCE(e.media, 0) - COALESCE(g.media, 0)) > ?
+               OR ABS(COALESCE(e.m2, 0) - COALESCE(g.m2, 0)) > MAX(1.0, ABS(COALESCE(e.m2, 0)) * ?)
+            ORDER BY k.user_id, k.categoria
+            """,
+            (TOLERANCIA_MEDIA, TOLERANCIA_M2_RELATIVA),
+        ).fetchall()
+    return [dict(r) for r in rows]
@@ -0,0 +1,185 @@
+"""
+Versões awaitable da API de database.db, pra não travar o event loop do bot.
+
+- leituras: pool de threads do tamanho do pool de leitura do SQLite
+- escritas: 1 thread só (single writer), executadas na ordem de chegada
+- cada lado tem um limite de tarefas em voo; quando enche, quem chama
+  espera a vez (backpressure) em vez de empilhar trabalho sem fim
+- inserir_transacao/registrar_transacao passam por um group commit: inserts que
+  chegam juntos (janela de poucos ms ou até MAX_GRUPO linhas) viram um commit só
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db
+
+MAX_EM_VOO_LEITURA = 64
+MAX_EM_VOO_ESCRITA = 256
+
+JANELA_GRUPO_SEG = 0.005
+MAX_GRUPO = 200
+
+_executor_leitura = ThreadPoolExecutor(
+    max_workers=db.TAMANHO_POOL_LEITURA,
+    thread_name_prefix="db-leitura",
+)
+_executor_escrita = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-escrita")
+
+_vagas_leitura = asyncio.Semaphore(MAX_EM_VOO_LEITURA)
+_vagas_escrita = asyncio.Semaphore(MAX_EM_VOO_ESCRITA)
+
+
+def _em_thread(executor, vagas, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        async with vagas:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+    return wrapper
+
+
+def _leitura(fn):
+    return _em_thread(_executor_leitura, _vagas_leitura, fn)
+
+
+def _escrita(fn):
+    return _em_thread(_executor_escrita, _vagas_escrita, fn)
+
+
+# =========================
+# LEITURA
+# =========================
+listar_usuarios = _leitura(db.listar_usuarios)
+resumo_mes = _leitura(db.resumo_mes)
+resumo_meses = _leitura(db.resumo_meses)
+top_categorias_mes = _leitura(db.top_categorias_mes)
+top_categorias_meses = _leitura(db.top_categorias_meses)
+gasto_diario_meses = _leitura(db.gasto_diario_meses)
+saldo_acumulado = _leitura(db.saldo_acumulado)
+relatorios_mes_lote = _leitura(db.relatorios_mes_lote)
+relatorio_renderizado = _leitura(db.relatorio_renderizado)
+alerta_ja_enviado = _leitura(db.alerta_ja_enviado)
+alertas_diarios_pendentes = _leitura(db.alertas_diarios_pendentes)
+total_gasto_categoria_mes = _leitura(db.total_gasto_categoria_mes)
+buscar_resumo_mensal = _leitura(db.buscar_resumo_mensal)
+buscar_transacoes_mensal = _leitura(db.buscar_transacoes_mensal)
+ultimas_transacoes = _leitura(db.ultimas_transacoes)
+pagina_transacoes = _leitura(db.pagina_transacoes)
+buscar_transacoes = _leitura(db.buscar_transacoes)
+buscar_transacao = _leitura(db.buscar_transacao)
+categorias_aprendidas = _leitura(db.categorias_aprendidas)
+listar_recorrencias = _leitura(db.listar_recorrencias)
+
+# =========================
+# ESCRITA
+# =========================
+inserir_transacoes = _escrita(db.inserir_transacoes)
+registrar_transacoes = _escrita(db.registrar_transacoes)
+importar_transacoes = _escrita(db.importar_transacoes)
+marcar_alerta_enviado = _escrita(db.marcar_alerta_enviado)
+marcar_alertas_enviados = _escrita(db.marcar_alertas_enviados)
+apagar_transacao = _escrita(db.apagar_transacao)
+registrar_parcelas = _escrita(db.registrar_parcelas)
+recategorizar_transacao = _escrita(db.recategorizar_transacao)
+salvar_categoria_aprendida = _escrita(db.salvar_categoria_aprendida)
+salvar_relatorios_renderizados = _escrita(db.salvar_relatorios_renderizados)
+criar_recorrencia = _escrita(db.criar_recorrencia)
+apagar_recorrencia = _escrita(db.apagar_recorrencia)
+lancar_recorrencias_vencidas = _escrita(db.lancar_recorrencias_vencidas)
+lancar_parcelas_vencidas = _escrita(db.lancar_parcelas_vencidas)
+
+
+# =========================
+# GROUP COMMIT
+# =========================
+_fila_grupo = None
+_tarefa_grupo = None
+
+
+def _garantir_grupo():
+    global _fila_grupo, _tarefa_grupo
+    if _tarefa_grupo is None:
+        # fila limitada: se o disco não acompanhar, quem insere espera
+        _fila_grupo = asyncio.Queue(maxsize=MAX_EM_VOO_ESCRITA)
+        _tarefa_grupo = asyncio.get_running_loop().create_task(_loop_grupo(_fila_grupo))
+    return _fila_grupo
+
+
+async def _gravar_grupo(lote):
+    loop = asyncio.get_running_loop()
+    try:
+        resultados = await loop.run_in_executor(_executor_escrita, db.registrar_transacoes, [linha for linha, _ in lote])
+    except Exception as e:
+        if len(lote) > 1:
+            # uma linha ruim não derruba as outras: regrava uma a uma
+            for item in lote:
+                await _gravar_grupo([item])
+            return
+        for _, fut in lote:
+            if not fut.done():
+                fut.set_exception(e)
+        return
+
+    for (_, fut), resultado in zip(lote, resultados):
+        if not fut.done():
+            fut.set_result(resultado)
+
+
+async def _loop_grupo(fila: asyncio.Queue):
+    encerrando = False
+    while not encerrando:
+        item = await fila.get()
+        if item is None:
+            break
+
+        lote = [item]
+        # espera a janela só se ainda não tem um grupo cheio na fila
+        if fila.qsize() < MAX_GRUPO - 1:
+            await asyncio.sleep(JANELA_GRUPO_SEG)
+
+        while len(lote) < MAX_GRUPO and not fila.empty():
+            item = fila.get_nowait()
+            if item is None:
+                encerrando = True
+                break
+            lote.append(item)
+
+        await _gravar_grupo(lote)
+
+
+async def registrar_transacao(user_id: int, tipo: str, valor_centavos: int, categoria: str, descricao: str | None):
+    """
+    Insere pelo group commit e devolve {id, total_categoria_centavos, historico}
+    (ver db.registrar_transacoes): o commit é compartilhado com os inserts
+    concorrentes, mas o resultado é o da própria linha.
+    """
+    fila = _garantir_grupo()
+    fut = asyncio.get_running_loop().create_future()
+    await fila.put(((user_id, tipo, valor_centavos, categoria, descricao), fut))
+    return await fut
+
+
+async def inserir_transacao(user_id: int, tipo: str, valor_centavos: int, categoria: str, descricao: str | None):
+    """
+    Mesma assinatura de db.inserir_transacao (devolve só o id).
+    """
+    return (await registrar_transacao(user_id, tipo, valor_centavos, categoria, descricao))["id"]
+
+
+async def encerrar():
+    """
+    Grava o que ainda está no group commit, espera a fila de escrita
+    terminar e fecha as conexões (shutdown do bot).
+    """
+    global _fila_grupo, _tarefa_grupo
+    if _tarefa_grupo is not None:
+        await _fila_grupo.put(None)
+        await _tarefa_grupo
+        _fila_grupo = _tarefa_grupo = None
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _executor_escrita.shutdown, True)
+    await loop.run_in_executor(None, _executor_leitura.shutdown, True)
+    db.fechar_conexoes()
@@ -0,0 +1,97 @@
+"""
+Manutenção do banco (rodar com o bot parado ou em horário tranquilo):
+
+    python -m database.manutencao verificar
+    python -m database.manutencao reconstruir
+"""
+import sys
+
+from database.db import (
+    criar_tabelas,
+    fechar_conexoes,
+    reconstruir_estatisticas_categoria,
+    reconstruir_resumo_mensal,
+    reconstruir_saldos,
+    verificar_estatisticas_categoria,
+    verificar_resumo_mensal,
+    verificar_saldos,
+)
+
+
+def _verificar() -> int:
+    ok = True
+
+    divergencias = verificar_resumo_mensal()
+    if not divergencias:
+        print("✅ resumo_mensal consistente com transacoes.")
+    else:
+        ok = False
+        print(f"❌ {len(divergencias)} divergência(s) em resumo_mensal:")
+        for d in divergencias:
+            print(
+                f"• user {d['user_id']} {d['mes']} {d['tipo']}/{d['categoria']}: "
+                f"esperado {d['esperado_centavos']} ({d['esperado_qtd']}x), "
+                f"gravado {d['gravado_centavos']} ({d['gravado_qtd']}x)"
+            )
+
+    divergencias = verificar_saldos()
+    if not divergencias:
+        print("✅ saldos consistentes com transacoes.")
+    else:
+        ok = False
+        print(f"❌ {len(divergencias)} divergência(s) em saldos:")
+        for d in divergencias:
+            print(
+                f"• user {d['user_id']}: esperado {d['esperado_centavos']}, "
+                f"gravado {d['gravado_centavos']}"
+            )
+
+    divergencias = verificar_estatisticas_categoria()
+    if not divergencias:
+        print("✅ estatisticas_categoria consistentes com transacoes.")
+    else:
+        ok = False
+        print(f"❌ {len(divergencias)} divergência(s) em estatisticas_categoria:")
+        for d in divergencias:
+            print(
+                f"• user {d['user_id']} {d['categoria']}: "
+                f"esperado n={d['esperado_n']} média={d['esperado_media']:.2f} m2={d['esperado_m2']:.2f}, "
+                f"gravado n={d['gravado_n']} média={d['gravado_media']:.2f} m2={d['gravado_m2']:.2f}"
+            )
+
+    if ok:
+        return 0
+    print("💡 Rode: python -m database.manutencao reconstruir")
+    return 1
+
+
+def _reconstruir() -> int:
+    linhas = reconstruir_resumo_mensal()
+    print(f"✅ resumo_mensal reconstruído ({linhas} linhas).")
+    usuarios = reconstruir_saldos()
+    print(f"✅ saldos reconstruídos ({usuarios} usuários).")
+    pares = reconstruir_estatisticas_categoria()
+    print(f"✅ estatisticas_categoria reconstruídas ({pares} categorias).")
+    return 0
+
+
+COMANDOS = {
+    "verificar": _verificar,
+    "reconstruir": _reconstruir,
+}
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 1 or argv[0] not in COMANDOS:
+        print(f"Use: python -m database.manutencao [{'|'.join(COMANDOS)}]")
+        return 2
+
+    criar_tabelas()
+    try:
+        return COMANDOS[argv[0]]()
+    finally:
+        fechar_conexoes()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -10,13 +10,11 @@ from config import (
     LIMITE_GASTOS_MENSAL,
 )
 
-from database.db import (
-    listar_usuarios,
-    saldo_acumulado,
-    resumo_mes,
-    alerta_ja_enviado,
-    marcar_alerta_enviado,
+from database.db_async import (
+    alertas_diarios_pendentes,
+    marcar_alertas_enviados,
 )
+from utils.envio import enviar_em_massa
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -25,57 +23,54 @@ def _fmt(v: float) -> str:
     return f"R$ {v:,.2f}"
 
 
-async def _rodar_alertas_para_usuario(context: ContextTypes.DEFAULT_TYPE, user_id: int):
-    agora = datetime.now(TZ)
-    periodo_mes = agora.strftime("%Y-%m")  # evita spam por mês
-    ano, mes = agora.year, agora.month
-
-    # 1) saldo acumulado negativo
-    if ALERTA_SALDO_NEGATIVO:
-        saldo = saldo_acumulado(user_id)
-        if saldo < 0 and not alerta_ja_enviado(user_id, "saldo_negativo", periodo_mes):
-            marcar_alerta_enviado(user_id, "saldo_negativo", periodo_mes)
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=(
-                        "🚨 *Alerta: saldo acumulado negativo*\n\n"
-                        f"💼 Saldo acumulado: {_fmt(saldo)}\n"
-                        "💡 Dica: revise os gastos e tente voltar pro positivo."
-                    ),
-                    parse_mode="Markdown",
-                )
-            except Exception:
-                pass
-
-    # 2) limite de gastos do mês (gastos_totais inclui investimentos)
-    if ALERTA_LIMITE_GASTOS:
-        entradas, gastos_totais, investimentos = resumo_mes(user_id, ano, mes)
-
-        if gastos_totais >= LIMITE_GASTOS_MENSAL and not alerta_ja_enviado(user_id, "limite_gastos", periodo_mes):
-            marcar_alerta_enviado(user_id, "limite_gastos", periodo_mes)
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=(
-                        "⚠️ *Alerta: limite de gastos atingido*\n\n"
-                        f"💸 Gastos no mês: {_fmt(gastos_totais)}\n"
-                        f"🎯 Limite configurado: {_fmt(LIMITE_GASTOS_MENSAL)}\n"
-                    ),
-                    parse_mode="Markdown",
-                )
-            except Exception:
-                pass
+def _texto_alerta(alerta: str, valor_centavos: int) -> str:
+    if alerta == "saldo_negativo":
+        return (
+            "🚨 *Alerta: saldo acumulado negativo*\n\n"
+            f"💼 Saldo acumulado: {_fmt(valor_centavos / 100)}\n"
+            "💡 Dica: revise os gastos e tente voltar pro positivo."
+        )
+
+    # limite de gastos do mês (gastos_totais inclui investimentos)
+    return (
+        "⚠️ *Alerta: limite de gastos atingido*\n\n"
+        f"💸 Gastos no mês: {_fmt(valor_centavos / 100)}\n"
+        f"🎯 Limite configurado: {_fmt(LIMITE_GASTOS_MENSAL)}\n"
+    )
+
+
+async def _rodar_alertas(context: ContextTypes.DEFAULT_TYPE, user_id: int | None = None):
+    """
+    Avalia os alertas de todos os usuários (ou de um só) em poucas consultas agrupadas,
+    marca tudo num INSERT OR IGNORE em lote e depois envia.
+    """
+    periodo_mes = datetime.now(TZ).strftime("%Y-%m")  # evita spam por mês
+
+    pendentes = await alertas_diarios_pendentes(
+        periodo_mes,
+        saldo_negativo=ALERTA_SALDO_NEGATIVO,
+        limite_gastos_centavos=int(round(LIMITE_GASTOS_MENSAL * 100)) if ALERTA_LIMITE_GASTOS else None,
+        user_id=user_id,
+    )
+    if not pendentes:
+        return
+
+    await marcar_alertas_enviados([(uid, alerta, periodo_mes) for uid, alerta, _ in pendentes])
+
+    await enviar_em_massa(
+        context.bot,
+        ((uid, _texto_alerta(alerta, valor_centavos)) for uid, alerta, valor_centavos in pendentes),
+        nome="alertas_diarios",
+    )
 
 
 # ✅ JOB diário (todos usuários)
 async def job_alertas_diarios(context: ContextTypes.DEFAULT_TYPE):
-    for user_id in listar_usuarios():
-        await _rodar_alertas_para_usuario(context, user_id)
+    await _rodar_alertas(context)
 
 
 # ✅ comando manual pra testar alertas na hora
 async def testar_alertas(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("🔍 Rodando alertas agora...")
-    await _rodar_alertas_para_usuario(context, update.effective_user.id)
+    await _rodar_alertas(context, update.effective_user.id)
     await update.message.reply_text("✅ Alertas testados (se algum gatilho foi atingido, você recebeu a mensagem).")
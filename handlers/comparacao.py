@@ -4,7 +4,7 @@ from zoneinfo import ZoneInfo
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from database.db import resumo_mes, top_categorias_mes
+from database.db_async import resumo_meses, top_categorias_meses
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -24,8 +24,8 @@ def _mes_anterior(ano: int, mes: int):
     return ano, mes - 1
 
 
-def _tem_dados(user_id: int, ano: int, mes: int) -> bool:
-    e, g, i = resumo_mes(user_id, ano, mes)
+def _tem_dados(resumo) -> bool:
+    e, g, i = resumo
     return (e > 0) or (g > 0) or (i > 0)
 
 
@@ -57,15 +57,19 @@ async def comparacao_mes_a_mes(update: Update, context: ContextTypes.DEFAULT_TYP
 
     user_id = update.effective_user.id
 
+    ano2, mes2 = _mes_anterior(ano_atual, mes_atual)
+    nome2 = MESES[mes2 - 1]
+
+    # ✅ os dois meses de uma vez (1 consulta pros totais + 1 pro top 3)
+    resumos = await resumo_meses(user_id, (ano2, mes2), (ano_atual, mes_atual))
+    tops = await top_categorias_meses(user_id, (ano2, mes2), (ano_atual, mes_atual), limite=3)
+
     # mês atual
-    e1, g1, i1 = resumo_mes(user_id, ano_atual, mes_atual)
+    e1, g1, i1 = resumos[(ano_atual, mes_atual)]
     s1 = e1 - g1  # saldo já considera investimentos porque gasto_total já inclui tudo
 
     # mês anterior
-    ano2, mes2 = _mes_anterior(ano_atual, mes_atual)
-    nome2 = MESES[mes2 - 1]
-
-    tem_prev = _tem_dados(user_id, ano2, mes2)
+    tem_prev = _tem_dados(resumos[(ano2, mes2)])
 
     texto = (
         "📈 *Comparação mês a mês*\n\n"
@@ -77,7 +81,7 @@ async def comparacao_mes_a_mes(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
     # Top 3 categorias do mês atual
-    tops1 = top_categorias_mes(user_id, ano_atual, mes_atual, limite=3)
+    tops1 = tops[(ano_atual, mes_atual)]
     if tops1:
         texto += "\n🏷️ *Top 3 gastos do mês:*\n"
         for cat, total in tops1:
@@ -86,7 +90,7 @@ async def comparacao_mes_a_mes(update: Update, context: ContextTypes.DEFAULT_TYP
     if not tem_prev:
         texto += "\nℹ️ Registre dados em pelo menos 2 meses para comparar."
     else:
-        e2, g2, i2 = resumo_mes(user_id, ano2, mes2)
+        e2, g2, i2 = resumos[(ano2, mes2)]
         s2 = e2 - g2
 
         texto += (
@@ -99,7 +103,7 @@ async def comparacao_mes_a_mes(update: Update, context: ContextTypes.DEFAULT_TYP
         )
 
         # Top 3 do mês anterior
-        tops2 = top_categorias_mes(user_id, ano2, mes2, limite=3)
+        tops2 = tops[(ano2, mes2)]
         if tops2:
             texto += "\n🏷️ *Top 3 gastos do mês anterior:*\n"
             for cat, total in tops2:
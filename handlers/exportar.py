@@ -0,0 +1,112 @@
+import asyncio
+import codecs
+import csv
+import io
+import tempfile
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database import db
+from utils.periodos import interpretar_periodo
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX é opcional
+    Workbook = None
+
+MAX_EXPORTACOES_SIMULTANEAS = 2
+MAX_EM_MEMORIA = 1024 * 1024  # acima disso o arquivo temporário vai pro disco
+
+CABECALHO = ("ID", "Data", "Tipo", "Categoria", "Descrição", "Valor")
+
+_vagas = asyncio.Semaphore(MAX_EXPORTACOES_SIMULTANEAS)
+
+
+def _linha(t):
+    tid, criado_em, tipo, categoria, descricao, valor = t
+    return tid, criado_em[:16].replace("T", " "), tipo, categoria, descricao or "", valor
+
+
+def _gerar_csv(user_id: int, inicio, fim):
+    """
+    Escreve o CSV bloco a bloco (fetchmany) num SpooledTemporaryFile.
+    Retorna: (arquivo posicionado no início, quantidade de linhas)
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=MAX_EM_MEMORIA)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=";")  # ; + vírgula decimal: abre certo no Excel BR
+
+    escritor.writerow(CABECALHO)
+    arquivo.write(codecs.BOM_UTF8)  # Excel reconhece o utf-8
+    total = 0
+    for bloco in db.iterar_transacoes(user_id, inicio, fim):
+        for t in bloco:
+            tid, data, tipo, categoria, descricao, valor = _linha(t)
+            escritor.writerow((tid, data, tipo, categoria, descricao, f"{valor:.2f}".replace(".", ",")))
+        total += len(bloco)
+
+        arquivo.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+
+    arquivo.write(buffer.getvalue().encode("utf-8"))
+    arquivo.seek(0)
+    return arquivo, total
+
+
+def _gerar_xlsx(user_id: int, inicio, fim):
+    """
+    Mesmo conteúdo em XLSX (openpyxl em modo write_only: linhas vão direto pro arquivo).
+    """
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet("Transações")
+    planilha.append(CABECALHO)
+
+    total = 0
+    for bloco in db.iterar_transacoes(user_id, inicio, fim):
+        for t in bloco:
+            planilha.append(_linha(t))
+        total += len(bloco)
+
+    arquivo = tempfile.SpooledTemporaryFile(max_size=MAX_EM_MEMORIA)
+    livro.save(arquivo)
+    arquivo.seek(0)
+    return arquivo, total
+
+
+async def exportar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /exportar [periodo] [csv|xlsx]
+    periodo: tudo (padrão), mes, AAAA-MM, MM/AAAA ou AAAA
+    """
+    args = list(context.args or [])
+    formato = "csv"
+    if args and args[-1].lower() in ("csv", "xlsx"):
+        formato = args.pop().lower()
+
+    try:
+        inicio, fim, rotulo = interpretar_periodo(" ".join(args))
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\nEx: /exportar 2024-03 ou /exportar 2024 xlsx")
+        return
+
+    aviso = ""
+    if formato == "xlsx" and Workbook is None:
+        formato = "csv"
+        aviso = "ℹ️ XLSX indisponível no servidor, enviando em CSV.\n"
+
+    gerar = _gerar_xlsx if formato == "xlsx" else _gerar_csv
+    async with _vagas:
+        arquivo, total = await asyncio.to_thread(gerar, update.effective_user.id, inicio, fim)
+
+    with arquivo:
+        if total == 0:
+            await update.message.reply_text(f"{aviso}ℹ️ Nenhum lançamento no período ({rotulo}).")
+            return
+
+        await update.message.reply_document(
+            document=arquivo,
+            filename=f"afinance_{rotulo}.{formato}",
+            caption=f"{aviso}📤 {total} lançamento(s) — período: {rotulo}",
+        )
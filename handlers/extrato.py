@@ -1,10 +1,20 @@
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
 
-from database.db import ultimas_transacoes, apagar_transacao
+from database.db_async import (
+    pagina_transacoes,
+    apagar_transacao,
+    buscar_transacao,
+    buscar_transacoes,
+    recategorizar_transacao,
+)
+from utils.categorias import categoria_canonica, categorias_validas
+from utils.categorias_usuario import aprender_categoria
+from utils.periodos import interpretar_periodo
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -29,6 +39,40 @@ def _data_curta(iso_str: str) -> str:
         return "--/--"
 
 
+def _montar_texto(itens: list[dict], titulo: str) -> str:
+    texto = f"{titulo}\n\n"
+    for t in itens:
+        data = _data_curta(t.get("criado_em", ""))
+        tipo = _tipo_label(t.get("tipo", ""))
+        valor = float(t.get("valor", 0) or 0)
+        cat = t.get("categoria", "—") or "—"
+        desc = t.get("descricao", "—") or "—"
+        tid = t.get("id")
+
+        texto += (
+            f"#{tid} • {data} • {tipo}\n"
+            f"📝 {escape_markdown(desc)} ({escape_markdown(cat)})\n"
+            f"💸 {_fmt(valor)}\n\n"
+        )
+
+    texto += "🧹 Para apagar: `/apagar ID` (ex: `/apagar 12`)\n🏷️ Categoria errada? `/categoria ID Categoria`"
+    return texto
+
+
+def _cursor(t: dict) -> str:
+    # criado_em vai por último porque tem ':' no meio (callback_data tem limite de 64 bytes)
+    return f"{t['id']}:{t['criado_em']}"
+
+
+def _teclado(itens: list[dict], limite: int, tem_mais_novos: bool, tem_mais_antigos: bool):
+    botoes = []
+    if tem_mais_novos:
+        botoes.append(InlineKeyboardButton("◀️ Mais novos", callback_data=f"ext:d:{limite}:{_cursor(itens[0])}"))
+    if tem_mais_antigos:
+        botoes.append(InlineKeyboardButton("Mais antigos ▶️", callback_data=f"ext:a:{limite}:{_cursor(itens[-1])}"))
+    return InlineKeyboardMarkup([botoes]) if botoes else None
+
+
 async def extrato(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     /extrato
@@ -49,34 +93,163 @@ async def extrato(update: Update, context: ContextTypes.DEFAULT_TYPE):
             limite = 10
 
     user_id = update.effective_user.id
-    itens = ultimas_transacoes(user_id, limite=limite)
+    itens, tem_mais = await pagina_transacoes(user_id, limite=limite)
 
+    teclado = None
     if not itens:
         texto = "📄 *Extrato*\n\nℹ️ Você ainda não tem lançamentos."
     else:
-        texto = f"📄 *Extrato* (últimos {len(itens)})\n\n"
-        for t in itens:
-            data = _data_curta(t.get("criado_em", ""))
-            tipo = _tipo_label(t.get("tipo", ""))
-            valor = float(t.get("valor", 0) or 0)
-            cat = t.get("categoria", "—") or "—"
-            desc = t.get("descricao", "—") or "—"
-            tid = t.get("id")
-
-            texto += (
-                f"#{tid} • {data} • {tipo}\n"
-                f"📝 {desc} ({cat})\n"
-                f"💸 {_fmt(valor)}\n\n"
-            )
-
-        texto += "🧹 Para apagar: `/apagar ID` (ex: `/apagar 12`)"
+        texto = _montar_texto(itens, f"📄 *Extrato* (últimos {len(itens)})")
+        teclado = _teclado(itens, limite, tem_mais_novos=False, tem_mais_antigos=tem_mais)
 
     # ✅ responde certo em callback ou comando
     if update.callback_query:
         await update.callback_query.answer()
-        await update.callback_query.message.reply_text(texto, parse_mode="Markdown")
+        await update.callback_query.message.reply_text(texto, parse_mode="Markdown", reply_markup=teclado)
     else:
-        await update.message.reply_text(texto, parse_mode="Markdown")
+        await update.message.reply_text(texto, parse_mode="Markdown", reply_markup=teclado)
+
+
+async def extrato_pagina(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Botões ◀️/▶️ do extrato: callback_data = ext:<a|d>:<limite>:<id>:<criado_em>
+    Edita a mesma mensagem com a página pedida.
+    """
+    query = update.callback_query
+    try:
+        _, direcao, limite, tid, criado_em = query.data.split(":", 4)
+        limite = min(max(int(limite), 1), 50)
+        cursor = (criado_em, int(tid))
+    except ValueError:
+        await query.answer("❌ Página inválida.")
+        return
+
+    user_id = update.effective_user.id
+    if direcao == "a":
+        itens, tem_mais = await pagina_transacoes(user_id, limite=limite, antes=cursor)
+        tem_mais_novos, tem_mais_antigos = True, tem_mais
+    else:
+        itens, tem_mais = await pagina_transacoes(user_id, limite=limite, depois=cursor)
+        tem_mais_novos, tem_mais_antigos = tem_mais, True
+
+    if not itens:
+        await query.answer("ℹ️ Não há mais lançamentos nessa direção.")
+        return
+
+    await query.answer()
+    await query.edit_message_text(
+        _montar_texto(itens, f"📄 *Extrato* ({len(itens)} lançamento(s))"),
+        parse_mode="Markdown",
+        reply_markup=_teclado(itens, limite, tem_mais_novos, tem_mais_antigos),
+    )
+
+
+TAMANHO_PAGINA_BUSCA = 10
+MAX_BUSCAS_GUARDADAS = 5  # botões de buscas mais antigas que isso expiram
+
+
+def _texto_busca(busca: dict, resultado: dict) -> str:
+    titulo = (
+        f"🔎 *Busca:* {escape_markdown(busca['termo'])} ({busca['rotulo']})\n"
+        f"🧾 {resultado['qtd']} lançamento(s) • 💸 Gastos: {_fmt(resultado['gastos'])}"
+        f" • 💰 Entradas: {_fmt(resultado['entradas'])}"
+    )
+    return _montar_texto(resultado["itens"], titulo)
+
+
+def _teclado_busca(chave: int, resultado: dict):
+    if not resultado["tem_mais"]:
+        return None
+    ultimo = resultado["itens"][-1]
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton("Mais antigos ▶️", callback_data=f"bus:{chave}:{_cursor(ultimo)}")]]
+    )
+
+
+async def buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /buscar <termo> [periodo]  (periodo: tudo, mes, AAAA-MM, MM/AAAA ou AAAA)
+    Lista os lançamentos que casam (descrição ou categoria) + o total somado.
+    """
+    args = list(context.args or [])
+    if not args:
+        await update.message.reply_text(
+            "Use: `/buscar ifood` ou `/buscar ifood 2025`\n(período: mes, AAAA-MM, MM/AAAA, AAAA ou tudo)",
+            parse_mode="Markdown",
+        )
+        return
+
+    inicio = fim = None
+    rotulo = "tudo"
+    if len(args) > 1:
+        try:
+            inicio, fim, rotulo = interpretar_periodo(args[-1])
+            args.pop()
+        except ValueError:
+            pass  # última palavra faz parte do termo
+
+    busca = {"termo": " ".join(args), "inicio": inicio, "fim": fim, "rotulo": rotulo}
+    resultado = await buscar_transacoes(
+        update.effective_user.id, busca["termo"], inicio, fim, limite=TAMANHO_PAGINA_BUSCA
+    )
+
+    if not resultado["itens"]:
+        await update.message.reply_text(f"🔎 Nada encontrado para \"{busca['termo']}\" ({rotulo}).")
+        return
+
+    # o termo não cabe no callback_data (64 bytes): fica guardado com uma chave curta,
+    # que vai no botão (cada mensagem de busca pagina o próprio termo)
+    chave = context.user_data.get("busca_seq", 0) + 1
+    context.user_data["busca_seq"] = chave
+    buscas = context.user_data.setdefault("buscas", {})
+    buscas[chave] = busca
+    for antiga in [c for c in buscas if c <= chave - MAX_BUSCAS_GUARDADAS]:
+        del buscas[antiga]
+
+    await update.message.reply_text(
+        _texto_busca(busca, resultado),
+        parse_mode="Markdown",
+        reply_markup=_teclado_busca(chave, resultado),
+    )
+
+
+async def buscar_pagina(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Botão "Mais antigos" da busca: callback_data = bus:<chave da busca>:<id>:<criado_em>
+    """
+    query = update.callback_query
+    try:
+        _, chave, tid, criado_em = query.data.split(":", 3)
+        chave = int(chave)
+        cursor = (criado_em, int(tid))
+    except ValueError:
+        await query.answer("❌ Página inválida.")
+        return
+
+    busca = context.user_data.get("buscas", {}).get(chave)
+
+    if not busca:
+        await query.answer("ℹ️ Busca expirada, rode o /buscar de novo.")
+        return
+
+    resultado = await buscar_transacoes(
+        update.effective_user.id,
+        busca["termo"],
+        busca["inicio"],
+        busca["fim"],
+        limite=TAMANHO_PAGINA_BUSCA,
+        antes=cursor,
+    )
+    if not resultado["itens"]:
+        await query.answer("ℹ️ Não há mais resultados.")
+        return
+
+    await query.answer()
+    await query.edit_message_text(
+        _texto_busca(busca, resultado),
+        parse_mode="Markdown",
+        reply_markup=_teclado_busca(chave, resultado),
+    )
 
 
 async def apagar(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -91,9 +264,53 @@ async def apagar(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_id = update.effective_user.id
-    ok = apagar_transacao(user_id, tid)
+    apagados = await apagar_transacao(user_id, tid)
 
-    if ok:
+    if apagados > 1:
+        await update.message.reply_text(f"✅ Compra parcelada apagada ({apagados} parcelas).")
+    elif apagados:
         await update.message.reply_text(f"✅ Lançamento #{tid} apagado com sucesso.")
     else:
         await update.message.reply_text("❌ Não encontrei esse ID (ou ele não pertence a você).")
+
+
+async def corrigir_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /categoria ID Nova Categoria
+    Corrige o lançamento e aprende: o próximo com o mesmo termo já cai na categoria certa.
+    """
+    if len(context.args) < 2:
+        await update.message.reply_text(
+            "Use: `/categoria ID Categoria`\nEx: `/categoria 12 Alimentação`",
+            parse_mode="Markdown",
+        )
+        return
+
+    try:
+        tid = int(context.args[0])
+    except ValueError:
+        await update.message.reply_text("❌ ID inválido. Ex: `/categoria 12 Alimentação`", parse_mode="Markdown")
+        return
+
+    user_id = update.effective_user.id
+    t = await buscar_transacao(user_id, tid)
+    if t is None:
+        await update.message.reply_text("❌ Não encontrei esse ID (ou ele não pertence a você).")
+        return
+
+    categoria = categoria_canonica(t["tipo"], " ".join(context.args[1:]))
+    if categoria is None:
+        opcoes = ", ".join(categorias_validas(t["tipo"]))
+        await update.message.reply_text(f"❌ Categoria desconhecida.\nOpções: {opcoes}")
+        return
+
+    if not await recategorizar_transacao(user_id, tid, categoria):
+        await update.message.reply_text("❌ Não encontrei esse ID (ou ele não pertence a você).")
+        return
+
+    termo = await aprender_categoria(user_id, t["tipo"], t.get("descricao") or "", categoria)
+
+    texto = f"✅ Lançamento #{tid} agora está em *{categoria}*."
+    if termo:
+        texto += f"\n🧠 Aprendi: \"{termo}\" → {categoria}"
+    await update.message.reply_text(texto, parse_mode="Markdown")
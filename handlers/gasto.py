@@ -5,32 +5,14 @@ from datetime import datetime
 import random
 
 from database.db import inserir_registro
+from utils.categorias import identificar_categoria
 
 AGUARDANDO_GASTO = 2
 
-CATEGORIAS = {
-    "uber": "Transporte",
-    "99": "Transporte",
-    "ifood": "Alimentação",
-    "lanche": "Alimentação",
-    "mercado": "Mercado",
-    "luz": "Contas",
-    "água": "Contas",
-    "internet": "Contas",
-    "aluguel": "Moradia",
-}
-
 def gerar_tag():
     meio = ''.join(random.choices('0123456789abcdef', k=5))
     return f"#A{meio}D"
 
-def detectar_categoria(texto: str) -> str:
-    t = texto.lower()
-    for chave, cat in CATEGORIAS.items():
-        if chave in t:
-            return cat
-    return "Outros"
-
 async def iniciar_gasto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.callback_query.answer()
     await update.callback_query.message.reply_text(
@@ -56,7 +38,7 @@ async def receber_gasto(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return AGUARDANDO_GASTO
 
     descricao = partes[1]
-    categoria = detectar_categoria(descricao)
+    categoria = identificar_categoria(descricao)
 
     data_db = datetime.now().strftime("%Y-%m-%d")
     data_msg = datetime.now().strftime("%d/%m/%Y")
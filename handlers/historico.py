@@ -4,7 +4,7 @@ from zoneinfo import ZoneInfo
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from database.db import resumo_mes
+from database.db_async import resumo_meses
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -14,17 +14,30 @@ MESES = [
 ]
 
 
+QTD_MESES_HISTORICO = 6
+
+
 def _fmt(v: float) -> str:
     return f"R$ {v:,.2f}"
 
 
+def _voltar_meses(ano: int, mes: int, qtd: int):
+    total = ano * 12 + (mes - 1) - qtd
+    return total // 12, total % 12 + 1
+
+
 async def historico_mensal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     agora = datetime.now(TZ)
     ano, mes = agora.year, agora.month
     nome_mes = MESES[mes - 1]
 
     user_id = update.effective_user.id
-    entradas, gastos_totais, investimentos = resumo_mes(user_id, ano, mes)
+
+    # ✅ 1 consulta só pros últimos meses (inclui o atual)
+    inicio = _voltar_meses(ano, mes, QTD_MESES_HISTORICO - 1)
+    resumos = await resumo_meses(user_id, inicio, (ano, mes))
+
+    entradas, gastos_totais, investimentos = resumos[(ano, mes)]
     saldo = entradas - gastos_totais
 
     texto = (
@@ -36,6 +49,12 @@ async def historico_mensal(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"💼 Saldo: {_fmt(saldo)}\n"
     )
 
+    anteriores = [(am, r) for am, r in resumos.items() if am != (ano, mes) and any(r)]
+    if anteriores:
+        texto += "\n📆 *Meses anteriores (saldo):*\n"
+        for (a, m), (e, g, _i) in reversed(anteriores):
+            texto += f"• {MESES[m - 1]}/{a}: {_fmt(e - g)}\n"
+
     if update.callback_query:
         await update.callback_query.answer()
         await update.callback_query.message.reply_text(texto, parse_mode="Markdown")
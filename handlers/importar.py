@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.db_async import importar_transacoes
+from utils.importacao import ler_extrato
+
+TZ = ZoneInfo("America/Cuiaba")
+
+TAMANHO_LOTE_IMPORTACAO = 1000  # linhas por commit
+INTERVALO_PROGRESSO_SEG = 2.0
+MAX_TAMANHO_ARQUIVO = 20 * 1024 * 1024  # limite de download da Bot API
+
+
+def _proximo_lote(lancamentos, user_id: int):
+    """
+    Puxa até TAMANHO_LOTE_IMPORTACAO lançamentos do gerador (roda em thread: parse é CPU).
+    Retorna: (linhas pro insert, linhas inválidas, acabou?)
+    """
+    linhas = []
+    invalidas = 0
+    for item in lancamentos:
+        if item is None:
+            invalidas += 1
+            continue
+
+        tipo, valor_centavos, categoria, descricao, data, origem_id = item
+        # sem hora no extrato: meio-dia no fuso do bot (não escorrega de dia/mês)
+        criado_em = datetime.fromisoformat(data).replace(hour=12, tzinfo=TZ).isoformat()
+        linhas.append((user_id, tipo, valor_centavos, categoria, descricao, criado_em, origem_id))
+        if len(linhas) >= TAMANHO_LOTE_IMPORTACAO:
+            return linhas, invalidas, False
+
+    return linhas, invalidas, True
+
+
+async def importar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "📥 *Importar extrato*\n\n"
+        "Envie o arquivo *.csv* ou *.ofx* exportado do seu banco (como documento).\n\n"
+        "• CSV: colunas de data, descrição e valor (negativo = gasto)\n"
+        "• OFX: lido direto do extrato\n\n"
+        "Lançamentos que já foram importados antes, ou que você já anotou à mão "
+        "(mesmo dia e valor), são ignorados.",
+        parse_mode="Markdown",
+    )
+
+
+async def importar_arquivo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    doc = update.message.document
+    user_id = update.effective_user.id
+
+    if doc.file_size and doc.file_size > MAX_TAMANHO_ARQUIVO:
+        await update.message.reply_text("❌ Arquivo grande demais (máx. 20 MB).")
+        return
+
+    status = await update.message.reply_text("⏳ Baixando o arquivo...")
+
+    fd, caminho = tempfile.mkstemp(suffix=os.path.splitext(doc.file_name or "")[1])
+    os.close(fd)
+    try:
+        arquivo = await context.bot.get_file(doc.file_id)
+        await arquivo.download_to_drive(caminho)
+
+        try:
+            lancamentos = await asyncio.to_thread(ler_extrato, caminho, doc.file_name or "")
+        except ValueError as e:
+            await status.edit_text(f"❌ {e}")
+            return
+
+        loop = asyncio.get_running_loop()
+        ultimo_progresso = loop.time()
+        lidas = novas = manuais = invalidas = 0
+
+        acabou = False
+        while not acabou:
+            linhas, ruins, acabou = await asyncio.to_thread(_proximo_lote, lancamentos, user_id)
+            invalidas += ruins
+            lidas += len(linhas)
+            if linhas:
+                entraram, ja_lancadas = await importar_transacoes(linhas)
+                novas += entraram
+                manuais += ja_lancadas
+
+            if not acabou and loop.time() - ultimo_progresso >= INTERVALO_PROGRESSO_SEG:
+                ultimo_progresso = loop.time()
+                await status.edit_text(f"⏳ Importando... {lidas} lançamentos lidos, {novas} novos.")
+
+        await status.edit_text(
+            "✅ Importação concluída!\n\n"
+            f"📥 Novos: {novas}\n"
+            f"🔁 Já importados antes: {lidas - novas - manuais}\n"
+            f"✍️ Já lançados à mão (mesmo dia e valor): {manuais}\n"
+            f"⚠️ Linhas ignoradas (inválidas): {invalidas}"
+        )
+    finally:
+        os.remove(caminho)
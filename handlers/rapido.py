@@ -4,38 +4,32 @@ from zoneinfo import ZoneInfo
 
 from telegram import Update
 from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
 
 from config import INVESTIMENTO_SUGERIDO_FIXO, LIMITES_MENSAIS_GASTO
-from database.db import inserir_transacao, total_gasto_categoria_mes
-from utils.alertas_inteligentes import checar_alerta_categoria
-
-# ✅ atalhos chamam handlers daqui
-from handlers.menu import menu_principal
-from handlers.stats import estatisticas
-from handlers.historico import historico_mensal
-from handlers.comparacao import comparacao_mes_a_mes
-from handlers.relatorio import relatorio_mes_passado, relatorio_mes_atual
+from database.db_async import registrar_parcelas, registrar_transacao, registrar_transacoes
+from utils.alertas_inteligentes import alerta_categoria, anomalia_gasto
+from utils.categorias_usuario import detectar_categoria_usuario
+from utils.formatacao import parse_valor_centavos
+from handlers.rotas import despachar_atalho
 
 TZ = ZoneInfo("America/Cuiaba")
 
+# mensagem com várias linhas (uma por lançamento): limite pra resposta caber no Telegram
+MAX_LINHAS_LOTE = 50
 
-def _parse_valor_centavos(texto: str) -> int | None:
-    if not texto:
-        return None
+# compra parcelada: "gasto 1200 tv 12x"
+MAX_PARCELAS = 48
 
-    t = texto.strip().lower().replace("r$", "").strip().replace(" ", "")
-    if "," in t and "." in t:
-        t = t.replace(".", "").replace(",", ".")
-    else:
-        t = t.replace(",", ".")
-
-    try:
-        v = float(t)
-        if v <= 0:
-            return None
-        return int(round(v * 100))
-    except ValueError:
+
+def _parse_parcelas(texto: str) -> int | None:
+    """
+    "12x" -> 12 (None se não for sufixo de parcelas)
+    """
+    t = texto.strip().lower()
+    if len(t) < 2 or not t.endswith("x") or not t[:-1].isdigit():
         return None
+    return int(t[:-1])
 
 
 def _fmt_centavos(c: int) -> str:
@@ -55,64 +49,7 @@ def _data_br() -> str:
     return datetime.now(TZ).strftime("%d/%m/%Y")
 
 
-def _norm(txt: str) -> str:
-    return (txt or "").strip().lower()
-
-
-# =========================
-# CATEGORIA AUTOMÁTICA
-# =========================
-MAPA_GASTOS = {
-    "Investimentos": [
-        "invest", "investimento", "aporte", "tesouro", "selic", "cdb", "lci", "lca",
-        "fii", "acao", "ação", "bitcoin", "cripto"
-    ],
-    "Alimentação": ["lanche", "almoço", "almoco", "janta", "pizza", "hamb", "ifood", "restaurante", "padaria"],
-    "Mercado": ["mercado", "super", "atacadao", "atacadão", "assai", "carrefour", "feira"],
-    "Transporte": ["uber", "99", "taxi", "gasolina", "ônibus", "onibus", "metro", "metrô"],
-    "Casa": ["aluguel", "condominio", "condomínio", "reforma", "faxina"],
-    "Contas": ["energia", "luz", "agua", "água", "internet", "telefone", "fatura", "boleto"],
-    "Saúde": ["farmacia", "farmácia", "remedio", "remédio", "consulta", "exame"],
-    "Educação": ["curso", "faculdade", "livro", "alura", "udemy"],
-    "Lazer": ["cinema", "show", "steam", "viagem", "hotel"],
-    "Assinaturas": ["assinatura", "netflix", "spotify", "prime", "disney", "hbo"],
-    "Roupas": ["roupa", "tenis", "tênis", "sapato"],
-}
-
-MAPA_ENTRADAS = {
-    "Salário": ["salario", "salário", "pagamento", "holerite", "empresa", "escritorio", "escritório"],
-    "Freela": ["freela", "cliente", "job", "projeto", "servico", "serviço"],
-    "Pix/Transferência": ["pix", "transfer", "ted", "doc", "deposito", "depósito"],
-    "Vendas": ["venda", "vendido", "olx", "enjoei", "mercado livre"],
-    "Reembolso": ["reembolso", "devolucao", "devolução", "estorno"],
-}
-
-
-def _detectar_categoria(tipo: str, descricao: str) -> str:
-    d = _norm(descricao)
-
-    if tipo == "gasto":
-        for cat, palavras in MAPA_GASTOS.items():
-            for p in palavras:
-                if p in d:
-                    return cat
-        return "Outros"
-
-    if tipo == "entrada":
-        for cat, palavras in MAPA_ENTRADAS.items():
-            for p in palavras:
-                if p in d:
-                    return cat
-        return "Outros"
-
-    return "Outros"
-
-
-def _insight_categoria(user_id: int, categoria: str) -> str:
-    agora = datetime.now(TZ)
-    ano, mes = agora.year, agora.month
-
-    total_cat = total_gasto_categoria_mes(user_id, categoria, ano, mes)
+def _insight_categoria(categoria: str, total_cat: float) -> str:
     limite = LIMITES_MENSAIS_GASTO.get(categoria)
 
     if limite and limite > 0:
@@ -122,49 +59,162 @@ def _insight_categoria(user_id: int, categoria: str) -> str:
         return f"📌 Neste mês você já gastou {_fmt_reais(total_cat)} em *{categoria}*."
 
 
+async def _pos_registro(user_id: int, categoria: str, total_centavos: int) -> str:
+    """
+    Etapa pós-insert do gasto: com o total da categoria que veio do próprio insert,
+    monta o insight + alerta de limite (se houver) pra ir numa resposta só.
+    """
+    total_cat = total_centavos / 100.0
+    partes = [_insight_categoria(categoria, total_cat)]
+
+    alerta = await alerta_categoria(user_id, categoria, total_cat)
+    if alerta:
+        partes.append(alerta)
+
+    return "\n\n".join(partes)
+
+
+def _linhas_salario(user_id: int, valor_salario: int, descricao: str):
+    """
+    Salário = entrada + gasto "Investimentos" automático (nunca maior que o salário).
+    Retorna: (linhas pro insert, investimento_centavos)
+    """
+    investimento_centavos = min(int(round(float(INVESTIMENTO_SUGERIDO_FIXO) * 100)), valor_salario)
+
+    linhas = [(user_id, "entrada", valor_salario, "Salário", descricao)]
+    if investimento_centavos > 0:
+        linhas.append((user_id, "gasto", investimento_centavos, "Investimentos", "investimento automático"))
+    return linhas, investimento_centavos
+
+
+async def _interpretar_linha(user_id: int, linha: str):
+    """
+    "gasto 35 uber" -> (linhas pro insert, None) ou (None, motivo do erro)
+    """
+    partes = linha.split()
+    cmd = partes[0].lower()
+    if cmd not in ("gasto", "entrada", "salario"):
+        return None, "use gasto, entrada ou salario"
+    if len(partes) < 2:
+        return None, "faltou o valor"
+
+    valor = parse_valor_centavos(partes[1])
+    if valor is None:
+        return None, "valor inválido"
+
+    # parcelado tem transação própria (parcelas futuras): não entra no commit único do lote
+    if cmd == "gasto" and len(partes) > 2 and _parse_parcelas(partes[-1]) is not None:
+        return None, "compra parcelada vai numa mensagem só dela (ex: gasto 1200 tv 12x)"
+
+    descricao = " ".join(partes[2:]) if len(partes) > 2 else cmd
+    if cmd == "salario":
+        return _linhas_salario(user_id, valor, descricao)[0], None
+
+    categoria = await detectar_categoria_usuario(user_id, cmd, descricao)
+    return [(user_id, cmd, valor, categoria, descricao)], None
+
+
+async def _registrar_lote(update: Update, linhas_txt: list[str]):
+    """
+    Várias linhas numa mensagem: valida tudo antes, grava tudo num commit só
+    (executemany), avalia os alertas 1x por categoria tocada e responde uma vez.
+    Se alguma linha for inválida, nada é gravado.
+    """
+    user_id = update.effective_user.id
+
+    if len(linhas_txt) > MAX_LINHAS_LOTE:
+        await update.message.reply_text(f"❌ Máximo de {MAX_LINHAS_LOTE} lançamentos por mensagem.")
+        return
+
+    linhas = []
+    erros = []
+    for n, linha in enumerate(linhas_txt, start=1):
+        interpretadas, erro = await _interpretar_linha(user_id, linha)
+        if erro:
+            erros.append(f"• Linha {n} ({linha}): {erro}")
+        else:
+            linhas.extend(interpretadas)
+
+    if erros:
+        # texto puro: a linha do usuário pode ter _ * ` que quebrariam o Markdown
+        await update.message.reply_text(
+            "❌ Nada foi anotado, corrija as linhas abaixo e mande de novo:\n\n" + "\n".join(erros)
+        )
+        return
+
+    registros = await registrar_transacoes(linhas)
+
+    entradas = gastos = 0
+    totais_cat = {}  # categoria -> total do mês (o último registro da categoria já tem o total final)
+    itens = []
+    anomalias = []
+    for (_, tipo, valor, categoria, descricao), registro in zip(linhas, registros):
+        if tipo == "entrada":
+            entradas += valor
+            emoji = "💰"
+        else:
+            gastos += valor
+            totais_cat[categoria] = registro["total_categoria_centavos"]
+            emoji = "💸"
+            anomalia = anomalia_gasto(categoria, valor, registro["historico"])
+            if anomalia:
+                anomalias.append(anomalia)
+                emoji = "🚨"
+        itens.append(
+            f"{emoji} {escape_markdown(descricao)} ({categoria}) {_fmt_centavos(valor)} - {_tag_curta(user_id, registro['id'])}"
+        )
+
+    texto = (
+        f"✅ {len(registros)} lançamentos anotados!\n\n"
+        + "\n".join(itens)
+        + f"\n\n💰 Entradas: {_fmt_centavos(entradas)}\n"
+        f"💸 Gastos: {_fmt_centavos(gastos)}\n"
+        f"🗓️ {_data_br()}"
+    )
+
+    if anomalias:
+        texto += "\n\n" + "\n\n".join(anomalias)
+
+    if totais_cat:
+        texto += "\n\n" + "\n".join(
+            _insight_categoria(cat, total / 100.0) for cat, total in totais_cat.items()
+        )
+
+    for cat, total in totais_cat.items():
+        alerta = await alerta_categoria(user_id, cat, total / 100.0)
+        if alerta:
+            texto += f"\n\n{alerta}"
+
+    await update.message.reply_text(texto, parse_mode="Markdown")
+
+
 async def processar_mensagem_rapida(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     ✅ Agora esse handler faz TUDO:
     - atalhos (menu/resumo/mes/comparar/relatorio)
     - entrada/gasto/salario automático
+    - várias linhas de entrada/gasto/salario numa mensagem só
     - insight após gasto
     """
     if not update.message or not update.message.text:
         return
 
     txt = update.message.text.strip()
-    lower = txt.lower()
 
     # =========================
     # ✅ ATALHOS (SEM ATRAPALHAR O RÁPIDO)
     # =========================
-    if lower in ("menu", "start"):
-        await menu_principal(update, context)
-        return
-
-    if lower in ("resumo", "stats"):
-        await estatisticas(update, context)
-        return
-
-    if lower in ("mes", "mês", "historico", "histórico"):
-        await historico_mensal(update, context)
-        return
-
-    if lower in ("comparar", "comparacao", "comparação"):
-        await comparacao_mes_a_mes(update, context)
-        return
-
-    if lower in ("relatorio", "relatório"):
-        await relatorio_mes_passado(update, context)
-        return
-
-    if lower in ("relatorio_atual", "relatório_atual"):
-        await relatorio_mes_atual(update, context)
+    if await despachar_atalho(update, context, txt):
         return
 
     # =========================
     # ✅ REGISTRO RÁPIDO
     # =========================
+    linhas_txt = [linha.strip() for linha in txt.splitlines() if linha.strip()]
+    if len(linhas_txt) > 1 and linhas_txt[0].split()[0].lower() in ("gasto", "entrada", "salario"):
+        await _registrar_lote(update, linhas_txt)
+        return
+
     partes = txt.split()
     if not partes:
         return
@@ -177,40 +227,17 @@ async def processar_mensagem_rapida(update: Update, context: ContextTypes.DEFAUL
             await update.message.reply_text("Use: salario 1300 escritorio")
             return
 
-        valor_salario = _parse_valor_centavos(partes[1])
+        valor_salario = parse_valor_centavos(partes[1])
         if valor_salario is None:
             await update.message.reply_text("❌ Valor inválido. Ex: salario 1300 ou salario 1300,00")
             return
 
         descricao = " ".join(partes[2:]) if len(partes) > 2 else "salario"
 
-        # 1) ENTRADA salário
-        tid_entrada = inserir_transacao(
-            user_id=update.effective_user.id,
-            tipo="entrada",
-            valor_centavos=valor_salario,
-            categoria="Salário",
-            descricao=descricao,
-        )
-
-        # 2) GASTO investimento automático
-        investimento_reais = float(INVESTIMENTO_SUGERIDO_FIXO)
-        investimento_centavos = int(round(investimento_reais * 100))
-
-        if investimento_centavos > valor_salario:
-            investimento_centavos = valor_salario
-
-        tid_invest = None
-        if investimento_centavos > 0:
-            tid_invest = inserir_transacao(
-                user_id=update.effective_user.id,
-                tipo="gasto",
-                valor_centavos=investimento_centavos,
-                categoria="Investimentos",
-                descricao="investimento automático",
-            )
-
-        tag = _tag_curta(update.effective_user.id, tid_entrada)
+        # ✅ entrada + investimento no mesmo commit
+        linhas, investimento_centavos = _linhas_salario(update.effective_user.id, valor_salario, descricao)
+        registros = await registrar_transacoes(linhas)
+        tag = _tag_curta(update.effective_user.id, registros[0]["id"])
 
         salario_reais = valor_salario / 100.0
         invest_reais_final = investimento_centavos / 100.0
@@ -224,15 +251,18 @@ async def processar_mensagem_rapida(update: Update, context: ContextTypes.DEFAUL
             f"🗓️ {_data_br()} - {tag}"
         )
 
-        await update.message.reply_text(msg)
-
-        if tid_invest is not None:
-            await checar_alerta_categoria(
-                context=context,
-                chat_id=update.effective_chat.id,
-                user_id=update.effective_user.id,
-                categoria="Investimentos",
+        # alerta de limite (se houver) vai junto, numa resposta só
+        if len(registros) > 1:
+            alerta = await alerta_categoria(
+                update.effective_user.id,
+                "Investimentos",
+                registros[1]["total_categoria_centavos"] / 100.0,
             )
+            if alerta:
+                await update.message.reply_text(f"{msg}\n\n{alerta}", parse_mode="Markdown")
+                return
+
+        await update.message.reply_text(msg)
         return
 
     # ENTRADA / GASTO normal
@@ -243,17 +273,40 @@ async def processar_mensagem_rapida(update: Update, context: ContextTypes.DEFAUL
         await update.message.reply_text(f"Use: {cmd} 35 descricao")
         return
 
-    valor = _parse_valor_centavos(partes[1])
+    valor = parse_valor_centavos(partes[1])
     if valor is None:
         await update.message.reply_text(f"❌ Valor inválido. Ex: {cmd} 35 uber")
         return
 
+    n_parcelas = _parse_parcelas(partes[-1]) if cmd == "gasto" and len(partes) > 2 else None
+    if n_parcelas is not None:
+        partes = partes[:-1]
+        if not 2 <= n_parcelas <= MAX_PARCELAS or valor < n_parcelas:
+            await update.message.reply_text(f"❌ Parcelas inválidas (de 2x a {MAX_PARCELAS}x). Ex: gasto 1200 tv 12x")
+            return
+
     descricao = " ".join(partes[2:]) if len(partes) > 2 else cmd
     tipo_db = "entrada" if cmd == "entrada" else "gasto"
-    categoria = _detectar_categoria(tipo_db, descricao)
+    categoria = await detectar_categoria_usuario(update.effective_user.id, tipo_db, descricao)
 
-    tid = inserir_transacao(update.effective_user.id, tipo_db, valor, categoria, descricao)
-    tag = _tag_curta(update.effective_user.id, tid)
+    if n_parcelas is not None:
+        compra = await registrar_parcelas(update.effective_user.id, valor, n_parcelas, categoria, descricao)
+        primeira, ultima = compra["parcelas"][0], compra["parcelas"][-1]
+        extra = await _pos_registro(update.effective_user.id, categoria, compra["total_categoria_centavos"])
+
+        await update.message.reply_text(
+            "✅ Compra parcelada anotada!\n\n"
+            f"📝 {escape_markdown(descricao)} ({categoria})\n"
+            f"💸 {_fmt_centavos(valor)} em {n_parcelas}x de {_fmt_centavos(primeira['valor_centavos'])}\n"
+            f"🗓️ 1ª parcela: {_data_br()} • última: {datetime.fromisoformat(ultima['criado_em']).strftime('%m/%Y')}\n"
+            f"🧹 Para apagar a compra toda: /apagar {compra['grupo_id']}\n\n"
+            f"{extra}",
+            parse_mode="Markdown",
+        )
+        return
+
+    registro = await registrar_transacao(update.effective_user.id, tipo_db, valor, categoria, descricao)
+    tag = _tag_curta(update.effective_user.id, registro["id"])
 
     if tipo_db == "entrada":
         await update.message.reply_text(
@@ -263,20 +316,16 @@ async def processar_mensagem_rapida(update: Update, context: ContextTypes.DEFAUL
             f"🗓️ {_data_br()} - {tag}"
         )
     else:
-        insight = _insight_categoria(update.effective_user.id, categoria)
+        extra = await _pos_registro(update.effective_user.id, categoria, registro["total_categoria_centavos"])
+        anomalia = anomalia_gasto(categoria, valor, registro["historico"])
+        if anomalia:
+            extra = f"{anomalia}\n\n{extra}"
 
         await update.message.reply_text(
             "✅ Gasto anotado!\n\n"
             f"📝 {descricao} ({categoria})\n"
             f"💸 {_fmt_centavos(valor)}\n"
             f"🗓️ {_data_br()} - {tag}\n\n"
-            f"{insight}",
+            f"{extra}",
             parse_mode="Markdown",
         )
-
-        await checar_alerta_categoria(
-            context=context,
-            chat_id=update.effective_chat.id,
-            user_id=update.effective_user.id,
-            categoria=categoria,
-        )
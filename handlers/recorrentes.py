@@ -0,0 +1,154 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+
+from database.db_async import (
+    apagar_recorrencia,
+    criar_recorrencia,
+    lancar_parcelas_vencidas,
+    lancar_recorrencias_vencidas,
+    listar_recorrencias,
+)
+from utils.categorias_usuario import detectar_categoria_usuario
+from utils.envio import enviar_em_massa
+from utils.formatacao import parse_valor_centavos
+from utils.periodos import CADENCIAS, primeira_execucao
+
+TZ = ZoneInfo("America/Cuiaba")
+
+_USO = (
+    "Use: `/recorrente gasto 55,90 netflix mensal 10`\n"
+    "• tipo: gasto ou entrada\n"
+    "• cadência: mensal (padrão), semanal ou anual\n"
+    "• dia do mês (opcional): sem ele, o 1º lançamento é hoje"
+)
+
+
+def _fmt_centavos(c: int) -> str:
+    return f"R$ {c/100:.2f}"
+
+
+def _data_br(iso: str) -> str:
+    return date.fromisoformat(iso).strftime("%d/%m/%Y")
+
+
+async def recorrente(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /recorrente <gasto|entrada> <valor> <descrição> [mensal|semanal|anual] [dia]
+    """
+    args = list(context.args or [])
+    if len(args) < 2 or args[0].lower() not in ("gasto", "entrada"):
+        await update.message.reply_text(_USO, parse_mode="Markdown")
+        return
+
+    tipo = args.pop(0).lower()
+    valor = parse_valor_centavos(args.pop(0))
+    if valor is None:
+        await update.message.reply_text("❌ Valor inválido. Ex: `/recorrente gasto 55,90 netflix`", parse_mode="Markdown")
+        return
+
+    dia = None
+    if args and args[-1].isdigit():
+        dia = int(args.pop())
+        if not 1 <= dia <= 31:
+            await update.message.reply_text("❌ Dia inválido (1 a 31).")
+            return
+
+    cadencia = "mensal"
+    if args and args[-1].lower() in CADENCIAS:
+        cadencia = args.pop().lower()
+
+    descricao = " ".join(args) or tipo
+    user_id = update.effective_user.id
+    hoje = datetime.now(TZ).date()
+
+    categoria = await detectar_categoria_usuario(user_id, tipo, descricao)
+    proxima = primeira_execucao(hoje, cadencia, dia)
+    rid = await criar_recorrencia(
+        user_id, tipo, valor, categoria, descricao, cadencia, dia or hoje.day, proxima.isoformat()
+    )
+
+    await update.message.reply_text(
+        "🔁 Recorrência cadastrada!\n\n"
+        f"📝 {descricao} ({categoria})\n"
+        f"💸 {_fmt_centavos(valor)} • {cadencia}\n"
+        f"🗓️ Próximo lançamento: {proxima.strftime('%d/%m/%Y')}\n"
+        f"🧹 Para cancelar: /cancelar_recorrente {rid}"
+    )
+
+
+async def listar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    itens = await listar_recorrencias(update.effective_user.id)
+    if not itens:
+        await update.message.reply_text("🔁 Você não tem recorrências.\n\n" + _USO, parse_mode="Markdown")
+        return
+
+    texto = "🔁 *Suas recorrências*\n\n"
+    for r in itens:
+        emoji = "💰" if r["tipo"] == "entrada" else "💸"
+        texto += (
+            f"#{r['id']} • {emoji} {escape_markdown(r['descricao'] or '')} ({escape_markdown(r['categoria'])})\n"
+            f"{_fmt_centavos(r['valor_centavos'])} • {r['cadencia']} • próximo: {_data_br(r['proxima_execucao'])}\n\n"
+        )
+    texto += "🧹 Para cancelar: `/cancelar_recorrente ID`"
+    await update.message.reply_text(texto, parse_mode="Markdown")
+
+
+async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        rid = int(context.args[0])
+    except (IndexError, ValueError, TypeError):
+        await update.message.reply_text("Use: `/cancelar_recorrente ID` (veja os IDs em /recorrentes)", parse_mode="Markdown")
+        return
+
+    if await apagar_recorrencia(update.effective_user.id, rid):
+        await update.message.reply_text(f"✅ Recorrência #{rid} cancelada.")
+    else:
+        await update.message.reply_text("❌ Não encontrei essa recorrência (ou ela não é sua).")
+
+
+# ✅ JOB: lança o que venceu (recorrências e parcelas de compras, em lotes pelo índice
+# da data de vencimento) e avisa cada dono 1x (texto do usuário escapado: um _ solto
+# daria BadRequest, que o envio em massa trata como falha permanente)
+async def job_recorrencias(context: ContextTypes.DEFAULT_TYPE):
+    agora = datetime.now(TZ)
+    hoje = agora.date().isoformat()
+
+    por_usuario = {}
+    while True:
+        lote = await lancar_recorrencias_vencidas(hoje)
+        if not lote:
+            break
+        for item in lote:
+            emoji = "💰" if item["tipo"] == "entrada" else "💸"
+            por_usuario.setdefault(item["user_id"], []).append(
+                f"{emoji} {escape_markdown(item['descricao'] or '')} ({escape_markdown(item['categoria'])})"
+                f" {_fmt_centavos(item['valor_centavos'])}"
+                f" • {_data_br(item['data'])} • #{item['transacao_id']}"
+            )
+
+    while True:
+        lote = await lancar_parcelas_vencidas(agora.isoformat())
+        if not lote:
+            break
+        for item in lote:
+            por_usuario.setdefault(item["user_id"], []).append(
+                f"💳 {escape_markdown(item['descricao'] or '')} ({escape_markdown(item['categoria'])})"
+                f" {_fmt_centavos(item['valor_centavos'])}"
+                f" • {_data_br(item['data'])} • #{item['transacao_id']}"
+            )
+
+    if not por_usuario:
+        return
+
+    await enviar_em_massa(
+        context.bot,
+        (
+            (user_id, "🔁 *Lançamentos programados anotados*\n\n" + "\n".join(linhas))
+            for user_id, linhas in por_usuario.items()
+        ),
+        nome="recorrencias",
+    )
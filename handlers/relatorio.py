@@ -3,10 +3,19 @@ from zoneinfo import ZoneInfo
 
 from telegram.ext import ContextTypes
 
-from database.db import listar_usuarios, resumo_mes, top_categorias_mes
+from database.db_async import (
+    relatorio_renderizado,
+    relatorios_mes_lote,
+    resumo_meses,
+    salvar_relatorios_renderizados,
+    top_categorias_mes,
+)
+from utils.envio import enviar_em_massa
 
 TZ = ZoneInfo("America/Cuiaba")
 
+TAMANHO_LOTE_RELATORIO = 500
+
 MESES = [
     "Janeiro","Fevereiro","Março","Abril","Maio","Junho",
     "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"
@@ -23,10 +32,13 @@ def _mes_anterior(ano: int, mes: int):
     return ano, mes - 1
 
 
-def montar_relatorio(user_id: int, ano: int, mes: int) -> str:
-    nome_mes = MESES[mes - 1]
+def _mes_fechado(ano: int, mes: int) -> bool:
+    agora = datetime.now(TZ)
+    return (ano, mes) < (agora.year, agora.month)
 
-    entradas, gastos_totais, investimentos = resumo_mes(user_id, ano, mes)
+
+def _renderizar_relatorio(ano: int, mes: int, entradas: float, gastos_totais: float, investimentos: float, tops) -> str:
+    nome_mes = MESES[mes - 1]
     saldo = entradas - gastos_totais
 
     # Sem registros?
@@ -37,8 +49,6 @@ def montar_relatorio(user_id: int, ano: int, mes: int) -> str:
             f"ℹ️ Não há registros nesse mês."
         )
 
-    tops = top_categorias_mes(user_id, ano, mes, limite=5)
-
     texto = (
         f"📅 *Relatório Mensal*\n\n"
         f"🗓️ {nome_mes}/{ano}\n\n"
@@ -56,17 +66,69 @@ def montar_relatorio(user_id: int, ano: int, mes: int) -> str:
     return texto
 
 
+async def montar_relatorio(user_id: int, ano: int, mes: int) -> str:
+    """
+    Mês fechado: serve o texto já renderizado (se a versão dos dados bater)
+    e guarda o que renderizar. Mês atual: sempre monta na hora.
+    """
+    fechado = _mes_fechado(ano, mes)
+    if fechado:
+        versao, texto = await relatorio_renderizado(user_id, ano, mes)
+        if texto is not None:
+            return texto
+
+    entradas, gastos_totais, investimentos = (await resumo_meses(user_id, (ano, mes), (ano, mes)))[(ano, mes)]
+
+    tops = []
+    if entradas or gastos_totais or investimentos:
+        tops = await top_categorias_mes(user_id, ano, mes, limite=5)
+
+    texto = _renderizar_relatorio(ano, mes, entradas, gastos_totais, investimentos, tops)
+    if fechado:
+        await salvar_relatorios_renderizados(ano, mes, [(user_id, versao, texto)])
+    return texto
+
+
+async def _relatorios_em_lotes(ano: int, mes: int):
+    """
+    Gera (user_id, texto) de todos os usuários, lote a lote (keyset por user_id):
+    nunca materializa a lista inteira de usuários.
+    Reaproveita os relatórios já renderizados e salva os novos (pré-aquece o /relatorio).
+    """
+    apos = 0
+    while True:
+        lote = await relatorios_mes_lote(ano, mes, apos_user_id=apos, limite=TAMANHO_LOTE_RELATORIO)
+        if not lote:
+            return
+
+        textos = []
+        novos = []
+        for r in lote:
+            texto = r["texto"]
+            if texto is None:
+                texto = _renderizar_relatorio(ano, mes, r["entradas"], r["gastos_totais"], r["investimentos"], r["tops"])
+                novos.append((r["user_id"], r["versao"], texto))
+            textos.append((r["user_id"], texto))
+
+        if novos and _mes_fechado(ano, mes):
+            await salvar_relatorios_renderizados(ano, mes, novos)
+
+        for item in textos:
+            yield item
+
+        apos = lote[-1]["user_id"]
+
+
 # ✅ JOB: roda dia 1 e envia o relatório do MÊS PASSADO
 async def job_virada_mes(context: ContextTypes.DEFAULT_TYPE):
     agora = datetime.now(TZ)
     ano_passado, mes_passado = _mes_anterior(agora.year, agora.month)
 
-    for user_id in listar_usuarios():
-        try:
-            texto = montar_relatorio(user_id, ano_passado, mes_passado)
-            await context.bot.send_message(chat_id=user_id, text=texto, parse_mode="Markdown")
-        except Exception:
-            pass
+    await enviar_em_massa(
+        context.bot,
+        _relatorios_em_lotes(ano_passado, mes_passado),
+        nome="relatorio_virada_mes",
+    )
 
 
 # ✅ COMANDO MANUAL: manda relatório do mês passado pra quem pediu (teste)
@@ -74,12 +136,12 @@ async def relatorio_mes_passado(update, context: ContextTypes.DEFAULT_TYPE):
     agora = datetime.now(TZ)
     ano_passado, mes_passado = _mes_anterior(agora.year, agora.month)
 
-    texto = montar_relatorio(update.effective_user.id, ano_passado, mes_passado)
+    texto = await montar_relatorio(update.effective_user.id, ano_passado, mes_passado)
     await update.message.reply_text(texto, parse_mode="Markdown")
 
 
 # ✅ COMANDO EXTRA: relatório do mês atual (só pra conferência)
 async def relatorio_mes_atual(update, context: ContextTypes.DEFAULT_TYPE):
     agora = datetime.now(TZ)
-    texto = montar_relatorio(update.effective_user.id, agora.year, agora.month)
+    texto = await montar_relatorio(update.effective_user.id, agora.year, agora.month)
     await update.message.reply_text(texto, parse_mode="Markdown")
@@ -0,0 +1,86 @@
+import importlib
+
+from telegram import BotCommand
+from telegram.ext import CallbackQueryHandler, CommandHandler
+
+# =========================
+# TABELA DE ROTAS
+# =========================
+# Uma linha por comando:
+# (comando, "modulo:funcao", descrição no menu do Telegram, atalhos de texto, callback_data do botão)
+# - o mesmo comando vira CommandHandler + BotCommand (+ CallbackQueryHandler se tiver botão)
+# - os atalhos de texto ("resumo", "mês"...) caem num dict só: 1 lookup, não importa quantos comandos
+# - o módulo do handler só é importado no 1º uso
+ROTAS = (
+    ("start", "handlers.menu:menu_principal", "Abrir menu", ("menu", "start"), None),
+    ("stats", "handlers.stats:estatisticas", "Resumo financeiro", ("resumo", "stats"), "stats"),
+    ("historico", "handlers.historico:historico_mensal", "Histórico mensal", ("mes", "mês", "historico", "histórico"), "historico"),
+    ("comparar", "handlers.comparacao:comparacao_mes_a_mes", "Comparação mês a mês", ("comparar", "comparacao", "comparação"), "comparar"),
+    ("relatorio", "handlers.relatorio:relatorio_mes_passado", "Relatório do mês passado", ("relatorio", "relatório"), None),
+    ("relatorio_atual", "handlers.relatorio:relatorio_mes_atual", "Relatório do mês atual", ("relatorio_atual", "relatório_atual"), None),
+    ("extrato", "handlers.extrato:extrato", "Ver últimos lançamentos", (), "extrato"),
+    ("apagar", "handlers.extrato:apagar", "Apagar lançamento por ID", (), None),
+    ("categoria", "handlers.extrato:corrigir_categoria", "Corrigir categoria de um lançamento", (), None),
+    ("buscar", "handlers.extrato:buscar", "Buscar lançamentos por descrição", (), None),
+    ("recorrente", "handlers.recorrentes:recorrente", "Cadastrar lançamento recorrente", (), None),
+    ("recorrentes", "handlers.recorrentes:listar", "Ver lançamentos recorrentes", (), None),
+    ("cancelar_recorrente", "handlers.recorrentes:cancelar", "Cancelar lançamento recorrente", (), None),
+    ("importar", "handlers.importar:importar", "Importar extrato (CSV/OFX)", (), None),
+    ("exportar", "handlers.exportar:exportar", "Exportar lançamentos (CSV/XLSX)", (), None),
+)
+
+_resolvidos = {}
+
+
+def resolver(alvo: str):
+    """
+    "modulo:funcao" -> função (importa o módulo na 1ª vez)
+    """
+    fn = _resolvidos.get(alvo)
+    if fn is None:
+        modulo, nome = alvo.split(":")
+        fn = getattr(importlib.import_module(modulo), nome)
+        _resolvidos[alvo] = fn
+    return fn
+
+
+def preguicoso(alvo: str):
+    """
+    Callback pro python-telegram-bot que só importa o handler de verdade quando é chamado.
+    """
+    async def handler(*args, **kwargs):
+        return await resolver(alvo)(*args, **kwargs)
+
+    handler.__name__ = alvo.split(":")[1]
+    return handler
+
+
+_HANDLERS = {comando: preguicoso(alvo) for comando, alvo, _, _, _ in ROTAS}
+
+ATALHOS = {
+    atalho: _HANDLERS[comando]
+    for comando, _, _, atalhos, _ in ROTAS
+    for atalho in atalhos
+}
+
+
+async def despachar_atalho(update, context, texto: str) -> bool:
+    """
+    Se o texto for um atalho ("menu", "resumo", "mês"...), roda o handler e retorna True.
+    """
+    handler = ATALHOS.get(texto.strip().lower())
+    if handler is None:
+        return False
+    await handler(update, context)
+    return True
+
+
+def registrar_rotas(app):
+    for comando, _, _, _, callback_data in ROTAS:
+        app.add_handler(CommandHandler(comando, _HANDLERS[comando]))
+        if callback_data:
+            app.add_handler(CallbackQueryHandler(_HANDLERS[comando], pattern=f"^{callback_data}$"))
+
+
+def comandos_menu() -> list[BotCommand]:
+    return [BotCommand(comando, descricao) for comando, _, descricao, _, _ in ROTAS if descricao]
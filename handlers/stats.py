@@ -4,7 +4,9 @@ from zoneinfo import ZoneInfo
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from database.db import resumo_mes, top_categorias_mes
+from config import LIMITES_MENSAIS_GASTO
+from database.db_async import resumo_mes, top_categorias_mes
+from utils.previsao import previsao_mes
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -24,12 +26,13 @@ async def estatisticas(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     user_id = update.effective_user.id
 
-    entradas, gastos_totais, investimentos = resumo_mes(user_id, ano, mes)
+    entradas, gastos_totais, investimentos = await resumo_mes(user_id, ano, mes)
 
     # ✅ saldo agora considera investimento como gasto (já está incluso em gastos_totais)
     saldo = entradas - gastos_totais
 
-    tops = top_categorias_mes(user_id, ano, mes, limite=5)
+    tops = await top_categorias_mes(user_id, ano, mes, limite=5)
+    previsao = await previsao_mes(user_id)
 
     texto = (
         f"📊 *Resumo Financeiro do mês (atual)*\n"
@@ -45,6 +48,15 @@ async def estatisticas(update: Update, context: ContextTypes.DEFAULT_TYPE):
         for cat, total in tops:
             texto += f"• {cat}: {_fmt(total)}\n"
 
+    if previsao:
+        total_previsto = sum(p for _, p in previsao.values()) / 100
+        texto += f"\n🔮 *Previsão de fechamento:* {_fmt(total_previsto)} _(sem investimentos)_\n"
+        maiores = sorted(previsao.items(), key=lambda item: item[1][1], reverse=True)[:5]
+        for cat, (atual, previsto) in maiores:
+            limite = LIMITES_MENSAIS_GASTO.get(cat)
+            aviso = " ⚠️" if limite and previsto >= limite * 100 else ""
+            texto += f"• {cat}: {_fmt(atual / 100)} → {_fmt(previsto / 100)}{aviso}\n"
+
     if update.callback_query:
         await update.callback_query.answer()
         await update.callback_query.message.reply_text(texto, parse_mode="Markdown")
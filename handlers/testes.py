@@ -9,6 +9,6 @@ async def test_relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     agora = datetime.now()
     # testa o mês atual mesmo (só para ver a mensagem)
-    texto = montar_relatorio(user_id, agora.year, agora.month)
+    texto = await montar_relatorio(user_id, agora.year, agora.month)
 
     await update.message.reply_text(texto, parse_mode="Markdown")
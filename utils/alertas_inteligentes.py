@@ -1,10 +1,16 @@
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-from telegram.ext import ContextTypes
-
-from config import LIMITES_MENSAIS_GASTO, PERCENTUAL_AVISO
-from database.db import total_gasto_categoria_mes, alerta_ja_enviado, marcar_alerta_enviado
+from config import (
+    ALERTA_ANOMALIAS,
+    ANOMALIA_DESVIOS,
+    ANOMALIA_FATOR_MINIMO,
+    ANOMALIA_MIN_LANCAMENTOS,
+    DIA_MINIMO_ALERTA_PREVISAO,
+    LIMITES_MENSAIS_GASTO,
+    PERCENTUAL_AVISO,
+)
+from database.db_async import marcar_alerta_enviado
 
 TZ = ZoneInfo("America/Cuiaba")
 
@@ -13,52 +19,81 @@ def _fmt(v: float) -> str:
     return f"R$ {v:,.2f}"
 
 
-async def checar_alerta_categoria(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, categoria: str):
+async def alerta_categoria(user_id: int, categoria: str, gasto_mes: float) -> str | None:
     """
-    Aviso automático:
+    Aviso automático a partir do total do mês JÁ calculado:
     - 80% do limite -> 1 aviso por mês
     - estourou o limite -> 1 aviso por mês
+    - previsão de fechamento acima do limite (antes dos 80%) -> 1 aviso por mês
+    Retorna o texto do alerta (ou None). A checagem de "já enviado" e a marcação
+    são um INSERT OR IGNORE só, e só acontece quando algum gatilho foi atingido.
     """
     limite = LIMITES_MENSAIS_GASTO.get(categoria)
     if not limite:
-        return
+        return None
 
     agora = datetime.now(TZ)
     periodo_mes = agora.strftime("%Y-%m")
-    ano, mes = agora.year, agora.month
-
-    gasto_mes = total_gasto_categoria_mes(user_id, categoria, ano, mes)
 
     # Estourou o limite
     if gasto_mes >= limite:
-        chave = f"cat_estourou:{categoria}"
-        if not alerta_ja_enviado(user_id, chave, periodo_mes):
-            marcar_alerta_enviado(user_id, chave, periodo_mes)
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=(
-                    "⚠️ *Alerta: limite da categoria estourado*\n\n"
-                    f"📌 Categoria: *{categoria}*\n"
-                    f"💸 Gasto no mês: {_fmt(gasto_mes)}\n"
-                    f"🎯 Limite: {_fmt(limite)}\n"
-                ),
-                parse_mode="Markdown",
-            )
-        return
+        if not await marcar_alerta_enviado(user_id, f"cat_estourou:{categoria}", periodo_mes):
+            return None
+        return (
+            "⚠️ *Alerta: limite da categoria estourado*\n\n"
+            f"📌 Categoria: *{categoria}*\n"
+            f"💸 Gasto no mês: {_fmt(gasto_mes)}\n"
+            f"🎯 Limite: {_fmt(limite)}\n"
+        )
 
     # Aviso em 80%
-    gatilho = limite * PERCENTUAL_AVISO
-    if gasto_mes >= gatilho:
-        chave = f"cat_aviso:{categoria}"
-        if not alerta_ja_enviado(user_id, chave, periodo_mes):
-            marcar_alerta_enviado(user_id, chave, periodo_mes)
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=(
-                    "📌 *Aviso: você está chegando no limite*\n\n"
-                    f"📌 Categoria: *{categoria}*\n"
-                    f"💸 Gasto no mês: {_fmt(gasto_mes)}\n"
-                    f"🎯 Limite: {_fmt(limite)}\n"
-                ),
-                parse_mode="Markdown",
-            )
+    if gasto_mes >= limite * PERCENTUAL_AVISO:
+        if not await marcar_alerta_enviado(user_id, f"cat_aviso:{categoria}", periodo_mes):
+            return None
+        return (
+            "📌 *Aviso: você está chegando no limite*\n\n"
+            f"📌 Categoria: *{categoria}*\n"
+            f"💸 Gasto no mês: {_fmt(gasto_mes)}\n"
+            f"🎯 Limite: {_fmt(limite)}\n"
+        )
+
+    # Previsão: no ritmo dos últimos meses, fecha acima do limite (avisa mais cedo que os 80%)
+    if agora.day < DIA_MINIMO_ALERTA_PREVISAO:
+        return None
+    from utils.previsao import previsao_mes  # numpy só carrega quando a previsão é usada
+
+    _, previsto = (await previsao_mes(user_id)).get(categoria, (0, 0))
+    if previsto < limite * 100:
+        return None
+    if not await marcar_alerta_enviado(user_id, f"cat_previsao:{categoria}", periodo_mes):
+        return None
+    return (
+        "🔮 *Previsão: esse limite deve estourar*\n\n"
+        f"📌 Categoria: *{categoria}*\n"
+        f"💸 Gasto no mês: {_fmt(gasto_mes)}\n"
+        f"📈 Previsão até o fim do mês: {_fmt(previsto / 100)}\n"
+        f"🎯 Limite: {_fmt(limite)}\n"
+    )
+
+
+def anomalia_gasto(categoria: str, valor_centavos: int, historico: dict | None) -> str | None:
+    """
+    Gasto fora do padrão da categoria, pontuado em O(1) com o histórico
+    (n, média, desvio) que veio do próprio insert. Retorna o aviso (ou None).
+    """
+    if not ALERTA_ANOMALIAS or not historico or historico["n"] < ANOMALIA_MIN_LANCAMENTOS:
+        return None
+
+    media = historico["media_centavos"]
+    if media <= 0:
+        return None
+    if valor_centavos < media * ANOMALIA_FATOR_MINIMO:
+        return None
+    if valor_centavos <= media + ANOMALIA_DESVIOS * historico["desvio_centavos"]:
+        return None
+
+    return (
+        "🚨 *Gasto fora do padrão*\n"
+        f"{_fmt(valor_centavos / 100)} é {valor_centavos / media:.1f}x o seu gasto típico em *{categoria}* "
+        f"(média de {_fmt(media / 100)} em {historico['n']} lançamentos)."
+    )
@@ -1,14 +1,152 @@
-CATEGORIAS = {
-    "Transporte": ["uber", "99", "ônibus", "metro", "gasolina"],
-    "Alimentação": ["lanche", "pizza", "ifood", "hamburguer"],
-    "Mercado": ["mercado", "supermercado"],
-    "Moradia": ["aluguel", "luz", "água", "internet"],
-    "Investimento": ["investimento", "aporte", "ações", "fii"]
+import re
+import unicodedata
+
+# =========================
+# MAPAS DE CATEGORIA (ordem = prioridade)
+# =========================
+MAPA_GASTOS = {
+    "Investimentos": [
+        "invest", "investimento", "aporte", "tesouro", "selic", "cdb", "lci", "lca",
+        "fii", "acao", "ação", "bitcoin", "cripto"
+    ],
+    "Alimentação": ["lanche", "almoço", "almoco", "janta", "pizza", "hamb", "ifood", "restaurante", "padaria"],
+    "Mercado": ["mercado", "super", "atacadao", "atacadão", "assai", "carrefour", "feira"],
+    "Transporte": ["uber", "99", "taxi", "gasolina", "ônibus", "onibus", "metro", "metrô"],
+    "Casa": ["aluguel", "condominio", "condomínio", "reforma", "faxina"],
+    "Contas": ["energia", "luz", "agua", "água", "internet", "telefone", "fatura", "boleto"],
+    "Saúde": ["farmacia", "farmácia", "remedio", "remédio", "consulta", "exame"],
+    "Educação": ["curso", "faculdade", "livro", "alura", "udemy"],
+    "Lazer": ["cinema", "show", "steam", "viagem", "hotel"],
+    "Assinaturas": ["assinatura", "netflix", "spotify", "prime", "disney", "hbo"],
+    "Roupas": ["roupa", "tenis", "tênis", "sapato"],
+}
+
+MAPA_ENTRADAS = {
+    "Salário": ["salario", "salário", "pagamento", "holerite", "empresa", "escritorio", "escritório"],
+    "Freela": ["freela", "cliente", "job", "projeto", "servico", "serviço"],
+    "Pix/Transferência": ["pix", "transfer", "ted", "doc", "deposito", "depósito"],
+    "Vendas": ["venda", "vendido", "olx", "enjoei", "mercado livre"],
+    "Reembolso": ["reembolso", "devolucao", "devolução", "estorno"],
 }
 
+
+def normalizar(txt: str) -> str:
+    """
+    minúsculo, sem acento e com espaços colapsados ("Ônibus  Metrô" -> "onibus metro")
+    """
+    t = (txt or "").lower()
+    if not t.isascii():
+        t = unicodedata.normalize("NFKD", t)
+        t = "".join(c for c in t if not unicodedata.combining(c))
+    return " ".join(t.split())
+
+
+# =========================
+# MOTOR COMPILADO
+# =========================
+# Todas as palavras-chave de um mapa viram UMA regex em formato de trie
+# (cada caractere tem no máximo um caminho), então o custo é proporcional ao
+# tamanho da descrição e não ao número de palavras-chave.
+# Regras de fronteira:
+# - a palavra-chave precisa começar no início de uma palavra ("ifood" não casa em "pedidoifood")
+# - prefixo vale ("hamb" casa "hamburguer", "super" casa "supermercado")
+# - palavra-chave só de dígitos precisa ser a palavra inteira ("99" não casa em "1990")
+_FIM = ""
+
+
+def _regex_trie(no: dict) -> str:
+    ramos = [re.escape(ch) + _regex_trie(filho) for ch, filho in sorted(no.items()) if ch != _FIM]
+    if _FIM not in no:
+        return ramos[0] if len(ramos) == 1 else "(?:" + "|".join(ramos) + ")"
+
+    fim = r"(?!\w)" if no[_FIM] == "numero" else ""
+    if not ramos:
+        return fim
+    # guloso: tenta a palavra mais longa antes de parar aqui
+    if fim:
+        return "(?:" + "|".join(ramos + [fim]) + ")"
+    return "(?:" + "|".join(ramos) + ")?"
+
+
+def _compilar(mapa: dict):
+    categoria_da_palavra = {}
+    for cat, palavras in mapa.items():
+        for p in palavras:
+            categoria_da_palavra.setdefault(normalizar(p), cat)
+
+    trie = {}
+    for palavra in categoria_da_palavra:
+        no = trie
+        for ch in palavra:
+            no = no.setdefault(ch, {})
+        no[_FIM] = "numero" if palavra.isdigit() else "texto"
+
+    # lookahead: acha também palavras-chave que começam dentro de outra (ex: "mercado livre")
+    regex = re.compile(r"(?<!\w)(?=(" + _regex_trie(trie) + "))")
+    prioridade = {cat: i for i, cat in enumerate(mapa)}
+    return regex, categoria_da_palavra, prioridade
+
+
+_MOTORES = {
+    "gasto": _compilar(MAPA_GASTOS),
+    "entrada": _compilar(MAPA_ENTRADAS),
+}
+
+
+def detectar_categoria(tipo: str, descricao: str) -> str:
+    """
+    Categoria automática pela descrição. Se várias palavras-chave casarem,
+    vence a categoria que vem primeiro no mapa (mesma regra de antes).
+    """
+    motor = _MOTORES.get(tipo)
+    if motor is None:
+        return "Outros"
+    return _detectar(motor, descricao)
+
+
+def _detectar(motor, descricao: str) -> str:
+    regex, categoria_da_palavra, prioridade = motor
+    melhor = None
+    for m in regex.finditer(normalizar(descricao)):
+        cat = categoria_da_palavra[m.group(1)]
+        if melhor is None or prioridade[cat] < prioridade[melhor]:
+            melhor = cat
+            if prioridade[cat] == 0:
+                break
+
+    return melhor or "Outros"
+
+
+_STOPWORDS = {"com", "pra", "pro", "para", "por", "dos", "das", "nos", "nas", "uma", "que"}
+
+
+def termos(descricao: str) -> list[str]:
+    """
+    Termos "significativos" da descrição (normalizados, sem números e palavras curtas),
+    usados nas categorias aprendidas por usuário.
+    """
+    return [
+        t for t in normalizar(descricao).split()
+        if len(t) >= 3 and not t.isdigit() and t not in _STOPWORDS
+    ]
+
+
+def categorias_validas(tipo: str) -> list[str]:
+    mapa = MAPA_ENTRADAS if tipo == "entrada" else MAPA_GASTOS
+    return list(mapa) + ["Outros"]
+
+
+def categoria_canonica(tipo: str, texto: str) -> str | None:
+    """
+    "alimentacao" -> "Alimentação" (None se não for uma categoria conhecida do tipo)
+    """
+    alvo = normalizar(texto)
+    for cat in categorias_validas(tipo):
+        if normalizar(cat) == alvo:
+            return cat
+    return None
+
+
+# compat
 def identificar_categoria(texto):
-    texto = texto.lower()
-    for categoria, palavras in CATEGORIAS.items():
-        if any(p in texto for p in palavras):
-            return categoria
-    return "Outros"
+    return detectar_categoria("gasto", texto)
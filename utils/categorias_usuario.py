@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+from database.db_async import categorias_aprendidas, salvar_categoria_aprendida
+from utils.categorias import detectar_categoria, termos
+
+# =========================
+# CATEGORIAS APRENDIDAS (por usuário)
+# =========================
+# Quando o usuário corrige a categoria de um lançamento, o primeiro termo da
+# descrição passa a apontar pra categoria nova. Essas regras são consultadas
+# antes dos mapas globais, via um LRU em memória (1 consulta ao banco por
+# usuário, só no primeiro uso). Escrita é write-through: banco + cache.
+MAX_USUARIOS_CACHE = 2048
+
+_cache = OrderedDict()  # user_id -> {(tipo, termo): categoria}
+_geracao = 0  # muda a cada aprendizado: evita guardar no cache uma leitura que ficou velha
+
+
+async def _aprendidas(user_id: int) -> dict:
+    regras = _cache.get(user_id)
+    if regras is not None:
+        _cache.move_to_end(user_id)
+        return regras
+
+    geracao = _geracao
+    regras = await categorias_aprendidas(user_id)
+    if geracao == _geracao:
+        _cache[user_id] = regras
+        if len(_cache) > MAX_USUARIOS_CACHE:
+            _cache.popitem(last=False)
+    return regras
+
+
+async def detectar_categoria_usuario(user_id: int, tipo: str, descricao: str) -> str:
+    regras = await _aprendidas(user_id)
+    if regras:
+        for termo in termos(descricao):
+            cat = regras.get((tipo, termo))
+            if cat:
+                return cat
+    return detectar_categoria(tipo, descricao)
+
+
+async def aprender_categoria(user_id: int, tipo: str, descricao: str, categoria: str) -> str | None:
+    """
+    Grava a regra "primeiro termo da descrição -> categoria". Retorna o termo aprendido.
+    """
+    global _geracao
+    lista = termos(descricao)
+    if not lista:
+        return None
+
+    termo = lista[0]
+    await salvar_categoria_aprendida(user_id, tipo, termo, categoria)
+
+    _geracao += 1
+    regras = _cache.get(user_id)
+    if regras is not None:
+        regras[(tipo, termo)] = categoria
+    return termo
@@ -0,0 +1,138 @@
+import asyncio
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+# =========================
+# LIMITES DO TELEGRAM
+# =========================
+# ~30 msgs/s no total e ~1 msg/s por chat (acima disso vem RetryAfter)
+LIMITE_GLOBAL_POR_SEG = 30
+INTERVALO_MIN_POR_CHAT = 1.0
+MAX_CONCORRENCIA = 20
+MAX_TENTATIVAS = 5
+ESPERA_BASE_REDE = 1.0
+
+
+class _TokenBucket:
+    """
+    Balde de tokens (taxa por segundo, rajada = capacidade).
+    Tudo roda no mesmo event loop, então não precisa de lock.
+    """
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.pausado_ate = 0.0
+        self._ultimo = None
+
+    async def consumir(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            agora = loop.time()
+            if self._ultimo is None:
+                self._ultimo = agora
+
+            # flood control: ninguém envia até passar o RetryAfter
+            if agora < self.pausado_ate:
+                await asyncio.sleep(self.pausado_ate - agora)
+                continue
+
+            self.tokens = min(self.capacidade, self.tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+    def pausar(self, segundos: float):
+        loop = asyncio.get_running_loop()
+        self.pausado_ate = max(self.pausado_ate, loop.time() + segundos)
+
+
+async def _iterar(mensagens):
+    if hasattr(mensagens, "__aiter__"):
+        async for item in mensagens:
+            yield item
+    else:
+        for item in mensagens:
+            yield item
+
+
+async def _enviar_uma(bot, bucket: _TokenBucket, por_chat: dict, chat_id: int, texto: str, parse_mode, relatorio: dict):
+    loop = asyncio.get_running_loop()
+
+    # 1 envio por vez por chat (mantém a ordem e o intervalo mínimo, inclusive nos retries)
+    trava = por_chat.setdefault(chat_id, [asyncio.Lock(), None])[0]
+    async with trava:
+        erro = None
+        for tentativa in range(1, MAX_TENTATIVAS + 1):
+            ultimo = por_chat[chat_id][1]
+            if ultimo is not None:
+                espera = ultimo + INTERVALO_MIN_POR_CHAT - loop.time()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+
+            await bucket.consumir()
+            por_chat[chat_id][1] = loop.time()
+
+            try:
+                await bot.send_message(chat_id=chat_id, text=texto, parse_mode=parse_mode)
+                relatorio["enviados"] += 1
+                return
+            except RetryAfter as e:
+                segundos = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                bucket.pausar(segundos)
+                erro = e
+            except (Forbidden, BadRequest) as e:
+                # bloqueou o bot / chat inválido / markdown quebrado: não adianta repetir
+                relatorio["falhas"].append((chat_id, str(e)))
+                return
+            except NetworkError as e:
+                await asyncio.sleep(ESPERA_BASE_REDE * (2 ** (tentativa - 1)))
+                erro = e
+
+            relatorio["reenvios"] += 1
+
+        relatorio["falhas"].append((chat_id, str(erro)))
+
+
+async def enviar_em_massa(bot, mensagens, parse_mode: str | None = "Markdown", nome: str = "envio") -> dict:
+    """
+    Envia [(chat_id, texto), ...] (lista, gerador ou gerador assíncrono) respeitando
+    os limites do Telegram, com concorrência limitada e retry em RetryAfter/erro de rede.
+    Consome o gerador aos poucos (fila limitada), então não precisa materializar tudo.
+
+    Retorna o relatório: {"enviados": int, "reenvios": int, "falhas": [(chat_id, motivo), ...]}
+    """
+    bucket = _TokenBucket(LIMITE_GLOBAL_POR_SEG, LIMITE_GLOBAL_POR_SEG)
+    por_chat = {}  # chat_id -> [trava, horário do último envio]
+    relatorio = {"enviados": 0, "reenvios": 0, "falhas": []}
+    fila = asyncio.Queue(maxsize=MAX_CONCORRENCIA * 2)
+
+    async def trabalhador():
+        while True:
+            item = await fila.get()
+            if item is None:
+                return
+            chat_id, texto = item
+            try:
+                await _enviar_uma(bot, bucket, por_chat, chat_id, texto, parse_mode, relatorio)
+            except Exception as e:
+                relatorio["falhas"].append((chat_id, str(e)))
+
+    trabalhadores = [asyncio.create_task(trabalhador()) for _ in range(MAX_CONCORRENCIA)]
+    try:
+        async for item in _iterar(mensagens):
+            await fila.put(item)
+    finally:
+        for _ in trabalhadores:
+            await fila.put(None)
+        await asyncio.gather(*trabalhadores)
+
+    print(
+        f"📨 {nome}: {relatorio['enviados']} enviados, "
+        f"{len(relatorio['falhas'])} falhas, {relatorio['reenvios']} reenvios"
+    )
+    return relatorio
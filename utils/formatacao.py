@@ -11,3 +11,24 @@ def data_atual():
 
 def formatar_valor(valor: float):
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def parse_valor_centavos(texto: str) -> int | None:
+    """
+    "35", "35,90", "1.234,56", "R$ 10" -> centavos (None se inválido ou <= 0)
+    """
+    if not texto:
+        return None
+
+    t = texto.strip().lower().replace("r$", "").strip().replace(" ", "")
+    if "," in t and "." in t:
+        t = t.replace(".", "").replace(",", ".")
+    else:
+        t = t.replace(",", ".")
+
+    try:
+        v = float(t)
+        if v <= 0:
+            return None
+        return int(round(v * 100))
+    except ValueError:
+        return None
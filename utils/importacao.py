@@ -0,0 +1,212 @@
+import codecs
+import csv
+import hashlib
+import re
+from datetime import datetime
+
+from utils.categorias import detectar_categoria, normalizar
+
+# =========================
+# IMPORTAÇÃO DE EXTRATO (CSV / OFX)
+# =========================
+# Tudo em geradores: o arquivo é lido linha a linha do disco, então a memória
+# não cresce com o tamanho do extrato.
+# Cada lançamento sai como:
+#   (tipo, valor_centavos, categoria, descricao, "AAAA-MM-DD", origem_id)
+# origem_id identifica a linha no banco (FITID do OFX ou hash da linha no CSV)
+# e é o que evita duplicar quando o mesmo extrato é importado de novo.
+
+_COLUNAS_DATA = {"data", "date", "dt", "data lancamento", "data movimento"}
+_COLUNAS_VALOR = {"valor", "amount", "value", "quantia", "valor (r$)"}
+_COLUNAS_DESCRICAO = {"descricao", "description", "historico", "memo", "lancamento", "estabelecimento"}
+
+
+def detectar_encoding(caminho: str) -> str:
+    """
+    utf-8 (com ou sem BOM) se o arquivo inteiro decodificar; senão latin-1 (comum em banco BR).
+    Lê em blocos, sem carregar o arquivo todo.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    with open(caminho, "rb") as f:
+        try:
+            while bloco := f.read(1 << 16):
+                decodificador.decode(bloco)
+            decodificador.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return "latin-1"
+    return "utf-8-sig"
+
+
+_MILHAR_BR = re.compile(r"\d{1,3}(\.\d{3})+")
+
+
+def _parse_valor(texto: str, decimal_virgula: bool = False) -> int | None:
+    """
+    "-1.234,56" / "1234.56" / "R$ -12,00" -> centavos com sinal (None se não for número)
+    decimal_virgula=True (CSV de banco BR, separado por ;): "1.000" / "1.234.567" são milhar.
+    """
+    t = (texto or "").strip().lower().replace("r$", "").replace(" ", "")
+    if not t:
+        return None
+
+    negativo = t.startswith("-") or (t.startswith("(") and t.endswith(")"))
+    t = t.strip("-+()")
+    if "," in t and "." in t:
+        # o último separador é o decimal
+        if t.rfind(",") > t.rfind("."):
+            t = t.replace(".", "").replace(",", ".")
+        else:
+            t = t.replace(",", "")
+    elif decimal_virgula and _MILHAR_BR.fullmatch(t):
+        t = t.replace(".", "")
+    else:
+        t = t.replace(",", ".")
+
+    try:
+        centavos = int(round(float(t) * 100))
+    except ValueError:
+        return None
+    return -centavos if negativo else centavos
+
+
+def _parse_data(texto: str) -> str | None:
+    t = (texto or "").strip()[:10]
+    for formato in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%Y%m%d"):
+        try:
+            return datetime.strptime(t if formato != "%Y%m%d" else t[:8], formato).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _lancamento(data: str, valor_centavos: int, descricao: str, origem_id: str):
+    tipo = "entrada" if valor_centavos > 0 else "gasto"
+    descricao = " ".join((descricao or "").split())[:200] or tipo
+    return tipo, abs(valor_centavos), detectar_categoria(tipo, descricao), descricao, data, origem_id
+
+
+def _indices_cabecalho(cabecalho: list[str]):
+    nomes = [normalizar(c) for c in cabecalho]
+
+    def achar(opcoes):
+        for i, nome in enumerate(nomes):
+            if nome in opcoes:
+                return i
+        return None
+
+    return achar(_COLUNAS_DATA), achar(_COLUNAS_VALOR), achar(_COLUNAS_DESCRICAO)
+
+
+def ler_csv(caminho: str, encoding: str):
+    """
+    Gera (lancamento | None) por linha do CSV (None = linha inválida, pra contar).
+    Separador detectado (; ou ,). Com cabeçalho, acha as colunas pelo nome;
+    sem cabeçalho, assume data;descricao;valor.
+    Valor negativo = gasto, positivo = entrada.
+    """
+    with open(caminho, newline="", encoding=encoding) as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = csv.excel
+
+        # ; separa coluna quando a vírgula é o decimal (formato BR)
+        decimal_virgula = dialeto.delimiter == ";"
+        leitor = csv.reader(f, dialeto)
+        primeira = next(leitor, None)
+        if primeira is None:
+            return
+
+        i_data, i_valor, i_desc = _indices_cabecalho(primeira)
+        if i_data is None or i_valor is None:
+            # sem cabeçalho reconhecível: a 1ª linha já é dado
+            i_data, i_desc, i_valor = 0, 1, 2
+            linhas = _com_primeira(primeira, leitor)
+        else:
+            linhas = leitor
+
+        # hash -> ocorrências no dia (2 linhas iguais no mesmo dia são 2 lançamentos);
+        # extrato vem em ordem de data, então só guarda o dia corrente
+        vistos = {}
+        dia = None
+        for linha in linhas:
+            if not any(c.strip() for c in linha):
+                continue
+            try:
+                data = _parse_data(linha[i_data])
+                valor = _parse_valor(linha[i_valor], decimal_virgula)
+                descricao = linha[i_desc] if i_desc is not None and i_desc < len(linha) else ""
+            except IndexError:
+                yield None
+                continue
+
+            if data is None or not valor:
+                yield None
+                continue
+
+            if data != dia:
+                vistos.clear()
+                dia = data
+
+            chave = hashlib.sha1(f"{data}|{valor}|{normalizar(descricao)}".encode()).hexdigest()[:20]
+            n = vistos[chave] = vistos.get(chave, 0) + 1
+            yield _lancamento(data, valor, descricao, f"csv:{chave}:{n}")
+
+
+def _com_primeira(primeira, resto):
+    yield primeira
+    yield from resto
+
+
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def ler_ofx(caminho: str, encoding: str):
+    """
+    Gera (lancamento | None) por <STMTTRN> do OFX (SGML ou XML, uma tag por linha ou tudo junto).
+    """
+    atual = None
+    with open(caminho, encoding=encoding, errors="replace") as f:
+        for linha in f:
+            for fecha, tag, conteudo in _TAG_OFX.findall(linha):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if not fecha:
+                        atual = {}
+                        continue
+                    if atual is not None:
+                        yield _lancamento_ofx(atual)
+                    atual = None
+                elif atual is not None and not fecha and conteudo.strip():
+                    atual[tag] = conteudo.strip()
+
+    if atual:  # arquivo truncado sem </STMTTRN>
+        yield _lancamento_ofx(atual)
+
+
+def _lancamento_ofx(campos: dict):
+    data = _parse_data(campos.get("DTPOSTED", ""))
+    valor = _parse_valor(campos.get("TRNAMT", ""))
+    if data is None or not valor:
+        return None
+
+    descricao = campos.get("MEMO") or campos.get("NAME") or ""
+    fitid = campos.get("FITID")
+    if not fitid:
+        fitid = hashlib.sha1(f"{data}|{valor}|{normalizar(descricao)}".encode()).hexdigest()[:20]
+    return _lancamento(data, valor, descricao, f"ofx:{fitid}")
+
+
+def ler_extrato(caminho: str, nome_arquivo: str):
+    """
+    Escolhe o leitor pela extensão. Levanta ValueError se não for CSV/OFX.
+    """
+    encoding = detectar_encoding(caminho)
+    extensao = nome_arquivo.lower().rsplit(".", 1)[-1]
+    if extensao == "csv":
+        return ler_csv(caminho, encoding)
+    if extensao in ("ofx", "qfx"):
+        return ler_ofx(caminho, encoding)
+    raise ValueError("formato não suportado (use .csv ou .ofx)")
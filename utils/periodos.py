@@ -0,0 +1,79 @@
+import calendar
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("America/Cuiaba")
+
+
+def proximo_mes(ano: int, mes: int):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def interpretar_periodo(texto: str | None):
+    """
+    Período dos comandos (/exportar, /buscar) -> (inicio, fim, rótulo)
+    com inicio/fim no formato do criado_em (fim exclusivo; None = sem limite).
+    Aceita: vazio/"tudo", "mes"/"mês" (atual), "AAAA-MM", "MM/AAAA", "AAAA".
+    Levanta ValueError se não reconhecer.
+    """
+    t = (texto or "").strip().lower()
+    if t in ("", "tudo", "todos"):
+        return None, None, "tudo"
+
+    if t in ("mes", "mês"):
+        agora = datetime.now(TZ)
+        ano, mes = agora.year, agora.month
+    elif len(t) == 4 and t.isdigit():
+        ano = int(t)
+        return f"{ano:04d}-01", f"{ano + 1:04d}-01", t
+    else:
+        try:
+            if "/" in t:
+                mes_txt, ano_txt = t.split("/")
+            else:
+                ano_txt, mes_txt = t.split("-")
+            ano, mes = int(ano_txt), int(mes_txt)
+        except ValueError:
+            raise ValueError("período inválido (use AAAA-MM, MM/AAAA, AAAA ou tudo)") from None
+        if not (1 <= mes <= 12 and 1900 <= ano <= 9999):
+            raise ValueError("período inválido (use AAAA-MM, MM/AAAA, AAAA ou tudo)")
+
+    fim = proximo_mes(ano, mes)
+    return f"{ano:04d}-{mes:02d}", f"{fim[0]:04d}-{fim[1]:02d}", f"{ano:04d}-{mes:02d}"
+
+
+# =========================
+# CADÊNCIAS (lançamentos recorrentes)
+# =========================
+CADENCIAS = ("mensal", "semanal", "anual")
+
+
+def dia_no_mes(ano: int, mes: int, dia: int) -> date:
+    # dia 31 em mês de 30 (ou fevereiro) cai no último dia, sem perder o dia original
+    return date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1]))
+
+
+def proxima_execucao(atual: date, cadencia: str, dia: int) -> date:
+    """
+    Próxima data depois de "atual". dia = dia do mês (mensal/anual); ignorado no semanal.
+    """
+    if cadencia == "semanal":
+        return atual + timedelta(days=7)
+    if cadencia == "anual":
+        return dia_no_mes(atual.year + 1, atual.month, dia)
+
+    ano, mes = proximo_mes(atual.year, atual.month)
+    return dia_no_mes(ano, mes, dia)
+
+
+def primeira_execucao(hoje: date, cadencia: str, dia: int | None) -> date:
+    """
+    Sem dia: vence hoje. Com dia: a próxima ocorrência desse dia (hoje inclusive).
+    """
+    if dia is None or cadencia == "semanal":
+        return hoje
+    data = dia_no_mes(hoje.year, hoje.month, dia)
+    if data < hoje:
+        ano, mes = proximo_mes(hoje.year, hoje.month)
+        data = dia_no_mes(ano, mes, dia)
+    return data
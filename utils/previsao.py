@@ -0,0 +1,63 @@
+import calendar
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from config import MESES_HISTORICO_PREVISAO
+from database.db_async import gasto_diario_meses
+
+TZ = ZoneInfo("America/Cuiaba")
+
+
+def projetar(series: dict, dia: int, dias_mes: int) -> dict:
+    """
+    series = {(ano, mes): ((categoria, dia, acumulado_centavos), ...)} em ordem; o ÚLTIMO é o mês atual.
+    Previsão de fechamento = gasto do mês até agora + média do que os meses anteriores
+    gastaram DEPOIS do mesmo dia. Categoria sem histórico: ritmo linear do mês atual.
+    Retorna: {categoria: (atual_centavos, previsto_centavos)}
+    """
+    meses = list(series)
+    categorias = sorted({c for serie in series.values() for c, _, _ in serie})
+    if not categorias:
+        return {}
+
+    pos = {c: i for i, c in enumerate(categorias)}
+    pontos = np.array(
+        [(pos[c], m, d, v) for m, am in enumerate(meses) for c, d, v in series[am]],
+        dtype=np.int64,
+    )
+
+    # [categoria, mês, dia 0..31] -> acumulado; dia sem gasto repete o acumulado anterior
+    acumulado = np.zeros((len(categorias), len(meses), 32), dtype=np.int64)
+    acumulado[pontos[:, 0], pontos[:, 1], pontos[:, 2]] = pontos[:, 3]
+    np.maximum.accumulate(acumulado, axis=2, out=acumulado)
+
+    atual = acumulado[:, -1, -1]
+    historico = acumulado[:, :-1, :]
+    fechamento = historico[:, :, -1]
+    meses_com_gasto = fechamento.sum(axis=0) > 0
+    categorias_com_historico = fechamento.sum(axis=1) > 0
+
+    restante = np.zeros(len(categorias))
+    if meses_com_gasto.any():
+        restante = (fechamento - historico[:, :, dia])[:, meses_com_gasto].mean(axis=1)
+
+    # categoria sem histórico (nova no mês) vai pelo ritmo linear, cada uma por si
+    previsto = np.where(categorias_com_historico, atual + restante, atual * dias_mes / dia)
+
+    previsto = np.rint(previsto).astype(np.int64)
+    return {c: (int(a), int(p)) for c, a, p in zip(categorias, atual, previsto)}
+
+
+async def previsao_mes(user_id: int) -> dict:
+    """
+    Previsão de fechamento do mês atual por categoria (sem Investimentos).
+    Barata o bastante pra rodar a cada gasto: os meses fechados vêm do cache,
+    só a série do mês atual volta pro banco.
+    Retorna: {categoria: (atual_centavos, previsto_centavos)}
+    """
+    agora = datetime.now(TZ)
+    inicio = agora.year * 12 + agora.month - 1 - MESES_HISTORICO_PREVISAO
+    series = await gasto_diario_meses(user_id, (inicio // 12, inicio % 12 + 1), (agora.year, agora.month))
+    return projetar(series, agora.day, calendar.monthrange(agora.year, agora.month)[1])